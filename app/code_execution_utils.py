@@ -1,223 +1,286 @@
-import os
 import ast
-import math
-import docker
+from typing import Optional, Callable
+from concurrent.futures import as_completed
 
+from app.config import settings
+from app.execution.executors import get_executor
+from app.execution.harness import build_harness_program, parse_harness_output, get_harness_max_output_bytes
+from app.execution.profiles import get_default_execution_profile
+from app.execution.concurrency import ExecutionSlotTimeoutError, host_execution_slot, get_test_case_executor, split_into_chunks
+from app.grading.comparison import parse_printed_output, parse_expected_output, outputs_match
 
-def execute_code_in_container(language: str, code: str):
-    """
-    Task to run user-submitted code inside a Docker container.
-    """
-    # Set up language-specific Docker image
-    docker_image = {
-        "python": "python:3.12-slim",
-    }.get(language)
-
-    if not docker_image:
-        raise ValueError("Unsupported language")
-
-    language_file_extension = {
-        "python": ".py",
-    }
-    current_file_extension = language_file_extension.get(language)
-    if not current_file_extension:
-        raise ValueError("Unsupported language")
-
-    # Write the user's code to a temporary file
-    host_code_dir = "/tmp"  # Directory on the host
-    code_file_name = f"submission_code{current_file_extension}"
-    host_code_file = os.path.join(host_code_dir, code_file_name)
 
-    with open(host_code_file, "w") as f:
-        f.write(code)
+MAX_EXECUTION_TIME_IN_SECONDS = 10
+HARNESS_STARTUP_ALLOWANCE_IN_SECONDS = 5
 
-    # The code will be placed in the /app directory inside the container
-    container_code_file = f"/app/{code_file_name}"
 
-    MAX_EXECUTION_TIME_IN_SECONDS = 10
-
-    # Initialize Docker client
-    client = docker.from_env()
-
-    # Command to run inside the container
-    exec_cmd = {
-        "python": f"python {container_code_file}",
-    }.get(language)
-
-    result = None
+def execute_code_in_container(language: str, code: str, timeout: int = MAX_EXECUTION_TIME_IN_SECONDS, output_callback: Optional[Callable[[str, str], None]] = None, backend: Optional[str] = None, max_output_bytes: Optional[int] = None, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None):
+    """
+    Task to run user-submitted code inside a sandbox.
+
+    `backend` selects the executor ("docker" or "subprocess"); it defaults to
+    the `code_executor_backend` setting. Every execution gets its own
+    workspace, so concurrent executions never share files. When
+    `output_callback` is given, it receives the program's output as it is
+    produced. The output is capped at `max_output_bytes` (the
+    `execution_output_max_bytes` setting by default), and `memory_limit_mb`
+    and `cpu_quota` override the sandbox's default limits.
+    """
+    executor = get_executor(backend)
     try:
-        container = client.containers.run(
-            image = docker_image,
-            command = exec_cmd,
-            volumes = {host_code_dir: {"bind": "/app", "mode": "rw"}}, # Mount directory
-            working_dir = "/app",
-            detach = True,
-            user = "nobody",
-            read_only = True,
-            network_mode = "none",
-            mem_limit = "256m",
-            cpu_period = 100000,
-            cpu_quota = 50000,
-            pids_limit = 64,
-            security_opt = ["no-new-privileges"]
-        )
-        result = container.wait(
-            timeout = MAX_EXECUTION_TIME_IN_SECONDS
-        )
-        logs = container.logs().decode("utf-8")
-    except docker.errors.ContainerError as e:
-        logs = f"Error: {str(e)}"
-    except docker.errors.APIError as e:
-        logs = f"Docker API Error: {str(e)}"
-    except docker.errors.DockerException as e:
-        logs = f"Docker Execution Error: {str(e)}"
-    except Exception as e:
-        logs = f"Unexpected Error: {str(e)}"
-    finally:
-        # Clean up the container
-        container.remove(force=True)
-
-    if result is not None:
-        if result["StatusCode"] == 0:
-            return {"success": True, "output": logs}
-        else:
-            return {"success": False, "output": logs}
-    else:
-        return {"success": False, "output": logs}
+        with host_execution_slot():
+            return executor.execute(
+                language = language,
+                code = code,
+                timeout = timeout,
+                output_callback = output_callback,
+                max_output_bytes = max_output_bytes,
+                memory_limit_mb = memory_limit_mb,
+                cpu_quota = cpu_quota
+            )
+    except ExecutionSlotTimeoutError as e:
+        return {"success": False, "output": f"Sandbox Unavailable: {str(e)}"}
 
 
 def _compute_eval_result_dict(execution_result, code_expected_output, function_params_string):
     rv_dict = {}
 
     if execution_result["success"]:
-        # Extract and sanitize the actual output
-        actual_output = execution_result["output"].strip()
-
-        # Attempt to convert actual_output to match the expected type
-        try:
- 
-            # Convert to boolean if the actual output is a boolean-like string
-            if actual_output.lower() == "true":
-                actual_output = True
-            elif actual_output.lower() == "false":
-                actual_output = False
-            elif actual_output.lower() == "none":
-                actual_output = None
-            else:
-                # Attempt numeric conversion
-                try:
-                    actual_output = int(actual_output)
-                except ValueError:
-                    actual_output = float(actual_output)
-        except ValueError:
-            # Leave as string if no conversion applies
-            pass
-
-
-        if isinstance(actual_output, str) and (actual_output.startswith("(") or actual_output.startswith("[") or actual_output.startswith("{")):
-            actual_output = ast.literal_eval(actual_output)
-
-        if isinstance(code_expected_output, str) and (code_expected_output.startswith("(") or code_expected_output.startswith("[") or code_expected_output.startswith("{")):
-            code_expected_output = ast.literal_eval(code_expected_output)
+        # Programs with a result expression report a typed value; the others
+        # print their result
+        if "value" in execution_result:
+            actual_output = execution_result["value"]
+        else:
+            actual_output = parse_printed_output(execution_result["output"])
 
         # Populate the result dictionary
         rv_dict['program_output'] = actual_output
         rv_dict['expected_output'] = code_expected_output
         rv_dict['test_input_to_code'] = function_params_string
 
-        # Compare actual and expected output with type consideration
-        if isinstance(code_expected_output, list):
-            # Handle list comparison
-            if isinstance(actual_output, list) and len(actual_output) == len(code_expected_output):
-                rv_dict['correct'] = 'yes' if all(a == b for a, b in zip(actual_output, code_expected_output)) else 'no'
-            else:
-                rv_dict['correct'] = 'no'
+        if outputs_match(actual_output, code_expected_output, rel_tol=settings.grading_float_rel_tol, abs_tol=settings.grading_float_abs_tol):
+            rv_dict['correct'] = 'yes'
         else:
-            if isinstance(actual_output, float):
-                if math.isclose(actual_output, code_expected_output) is True:
-                    rv_dict['correct'] = 'yes'
-                else:
-                    rv_dict['correct'] = 'no'
-            else:
-                # Handle scalar and boolean comparison
-                if actual_output == code_expected_output:
-                    rv_dict['correct'] = 'yes'
-                else:
-                    rv_dict['correct'] = 'no'
+            rv_dict['correct'] = 'no'
+    elif execution_result.get("skipped"):
+        # Not run (fail-fast mode) since an earlier test case failed to run
+        rv_dict['correct'] = 'no'
+        rv_dict['skipped'] = True
+        rv_dict['error'] = "Skipped: an earlier test case failed to run."
     else:
         # Mark as failed if execution didn't succeed
         rv_dict['correct'] = 'no'
         rv_dict['error'] = execution_result.get("error", "Unknown error")
+        if execution_result.get("out_of_memory"):
+            rv_dict['out_of_memory'] = True
+
+    # Wall time, CPU time and peak memory, measured by the test harness
+    if "metrics" in execution_result:
+        rv_dict['execution_metrics'] = execution_result["metrics"]
 
     return rv_dict
 
 
-def run_test_cases_without_function(user_code: str, test_case_list: list):
+def _execute_harness_chunk(test_programs: list, backend: Optional[str] = None, fail_fast: bool = False, execution_profile: Optional[dict] = None):
+    if execution_profile is None:
+        execution_profile = get_default_execution_profile()
+    harness_program = build_harness_program(
+        programs = test_programs,
+        per_case_timeout = execution_profile['per_case_timeout'],
+        fail_fast = fail_fast,
+        max_output_bytes_per_program = execution_profile['output_max_bytes']
+    )
+    harness_execution_result = execute_code_in_container(
+        language = 'python',
+        code = harness_program,
+        timeout = execution_profile['per_case_timeout'] * len(test_programs) + HARNESS_STARTUP_ALLOWANCE_IN_SECONDS,
+        backend = backend,
+        max_output_bytes = get_harness_max_output_bytes(len(test_programs), execution_profile['output_max_bytes']),
+        memory_limit_mb = execution_profile['memory_limit_mb'],
+        cpu_quota = execution_profile['cpu_quota']
+    )
+    return parse_harness_output(
+        execution_result = harness_execution_result,
+        number_of_programs = len(test_programs)
+    )
+
+
+def _execute_single_program_chunk(test_programs: list, backend: Optional[str] = None, fail_fast: bool = False, execution_profile: Optional[dict] = None):
+    # Each program still goes through the harness (alone), which reports its
+    # result value
+    execution_results = []
+    for program in test_programs:
+        if fail_fast and len(execution_results) > 0 and not execution_results[-1]["success"]:
+            execution_results.append({"success": False, "output": "", "skipped": True})
+            continue
+        execution_results.append(_execute_harness_chunk([program], backend, execution_profile=execution_profile)[0])
+    return execution_results
+
+
+def _execute_test_programs(test_programs: list, backend: Optional[str] = None, chunk_callback: Optional[Callable[[int, list], None]] = None, fail_fast: bool = False, execution_profile: Optional[dict] = None):
     """
-    Run test cases for the given code and return results as a list of 'yes' or 'no'.
+    Execute the test case programs and return one execution result per program,
+    in the same order.
+
+    With the batched harness enabled, programs are shipped into a sandbox run
+    as a batch (each one still isolated in its own process with its own
+    timeout); otherwise every program gets its own container execution.
+
+    With parallel execution enabled, the batches (or single programs) are
+    fanned out over the bounded test case thread pool; the host-wide
+    execution slots keep Docker from being oversubscribed.
+
+    `chunk_callback(start_index, execution_results)` is called as soon as
+    each batch finishes.
+
+    With `fail_fast`, a batch stops at its first program that fails to run;
+    the rest of the batch is reported as skipped.
+
+    `execution_profile` holds the sandbox limits the programs run under (see
+    `get_lecture_question_execution_profile`); the defaults otherwise.
+    """
+    if len(test_programs) == 0:
+        return []
+
+    if settings.batched_test_harness_enabled:
+        number_of_chunks = settings.test_case_max_workers if settings.parallel_test_execution_enabled else 1
+        chunks = split_into_chunks(test_programs, number_of_chunks)
+        execute_chunk = _execute_harness_chunk
+    else:
+        chunks = [[program] for program in test_programs]
+        execute_chunk = _execute_single_program_chunk
+
+    chunk_start_indices = []
+    start_index = 0
+    for chunk in chunks:
+        chunk_start_indices.append(start_index)
+        start_index += len(chunk)
+
+    execution_result_list = [None] * len(test_programs)
+
+    def _store_chunk_results(chunk_start_index: int, chunk_results: list):
+        execution_result_list[chunk_start_index:chunk_start_index + len(chunk_results)] = chunk_results
+        if chunk_callback is not None:
+            chunk_callback(chunk_start_index, chunk_results)
+
+    if settings.parallel_test_execution_enabled and len(chunks) > 1:
+        test_case_executor = get_test_case_executor()
+        future_to_start_index = {
+            test_case_executor.submit(execute_chunk, chunk, backend, fail_fast, execution_profile): chunk_start_index
+            for chunk, chunk_start_index in zip(chunks, chunk_start_indices)
+        }
+        for future in as_completed(future_to_start_index):
+            _store_chunk_results(future_to_start_index[future], future.result())
+    else:
+        for chunk, chunk_start_index in zip(chunks, chunk_start_indices):
+            _store_chunk_results(chunk_start_index, execute_chunk(chunk, backend, fail_fast, execution_profile))
+
+    return execution_result_list
+
+
+def _evaluate_test_programs(test_programs: list, expected_output_list: list, function_params_string_list: list, backend: Optional[str] = None, test_case_callback: Optional[Callable[[int, dict], None]] = None, fail_fast: bool = False, execution_order: Optional[list] = None, execution_profile: Optional[dict] = None):
+    """
+    Run the test programs and compare their output with the expected output.
+
+    `test_case_callback(test_case_index, rv_dict)` is called as soon as a test
+    case result is known (used to push grading progress to the client).
+
+    `execution_order` is the order (a permutation of the test case indices)
+    in which the programs are run; results are always returned in test case
+    order. With `fail_fast`, the first program is run on its own, and if it
+    fails to run (syntax error, exception, timeout) the others are skipped.
+    """
+    results = [None] * len(test_programs)
+    if execution_order is None:
+        execution_order = list(range(len(test_programs)))
+    ordered_test_programs = [test_programs[test_case_index] for test_case_index in execution_order]
+
+    def _evaluate_chunk(chunk_start_index: int, chunk_execution_results: list):
+        for offset, execution_result in enumerate(chunk_execution_results):
+            test_case_index = execution_order[chunk_start_index + offset]
+            rv_dict = _compute_eval_result_dict(
+                execution_result=execution_result,
+                code_expected_output=expected_output_list[test_case_index],
+                function_params_string=function_params_string_list[test_case_index]
+            )
+            results[test_case_index] = rv_dict
+            if test_case_callback is not None:
+                test_case_callback(test_case_index, rv_dict)
+
+    if not fail_fast or len(ordered_test_programs) == 0:
+        _execute_test_programs(ordered_test_programs, backend, chunk_callback=_evaluate_chunk, execution_profile=execution_profile)
+        return results
+
+    first_execution_result = _execute_test_programs(ordered_test_programs[:1], backend, chunk_callback=_evaluate_chunk, execution_profile=execution_profile)[0]
+    if first_execution_result["success"]:
+        _execute_test_programs(
+            ordered_test_programs[1:],
+            backend,
+            chunk_callback = lambda chunk_start_index, chunk_execution_results: _evaluate_chunk(chunk_start_index + 1, chunk_execution_results),
+            fail_fast = True,
+            execution_profile = execution_profile
+        )
+    else:
+        _evaluate_chunk(1, [
+            {"success": False, "output": "", "skipped": True}
+            for _ in ordered_test_programs[1:]
+        ])
+    return results
+
+
+def compile_test_cases_without_function(test_case_list: list) -> list:
+    """
+    Compile test cases into the form `run_compiled_test_cases` consumes:
+    one `{"code_prefix", "result_expression", "expected_output",
+    "test_input_to_code"}` dict per test case.
 
     For this, the variables will be inserted at the top of the user's code.
     From there, the code will execute and run.
 
     Critical the user's code does not have pre-hardcoded variables.
     """
-    results = []
+    compiled_test_cases = []
     for tc_dict in test_case_list:
         code_input = tc_dict['input']
-        code_expected_output = tc_dict['expected_output']
         code_input_string = '\n'.join([f"{k} = {repr(code_input[k])}" for k in code_input])
-        full_code = code_input_string + '\n' + user_code
 
-        execution_result = execute_code_in_container(
-            language = 'python',
-            code = full_code
-        )
-
-        rv_dict = _compute_eval_result_dict(
-            execution_result=execution_result,
-            code_expected_output=code_expected_output,
-            function_params_string=code_input_string
-        )
-
-        results.append(rv_dict)
-
-    return results
+        compiled_test_cases.append({
+            'code_prefix': code_input_string + '\n',
+            'result_expression': None,
+            'expected_output': parse_expected_output(tc_dict['expected_output']),
+            'test_input_to_code': code_input_string,
+        })
+    return compiled_test_cases
 
 
-def run_test_cases_with_function(user_code: str, function_name: str, test_case_list: list):
-    results = []
+def compile_test_cases_with_function(function_name: str, test_case_list: list) -> list:
+    compiled_test_cases = []
     for tc_dict in test_case_list:
         code_input = tc_dict['input']
-        code_expected_output = tc_dict['expected_output']
 
+        # Lambda inputs are passed as source code, the same way they are written
+        # in the test case; other collections are validated and normalized
         # function_params_string = ", ".join([f"{k}={repr(code_input[k])}" for k in code_input])
-        parsed_input = {
-            k: eval(v) if isinstance(v, str) and v.startswith("[lambda") else
-            ast.literal_eval(v) if isinstance(v, str) and (v.startswith("(") or v.startswith("[")) else
-            v
+        parameter_source = {
+            k: v if isinstance(v, str) and v.startswith("[lambda") else
+            repr(ast.literal_eval(v)) if isinstance(v, str) and (v.startswith("(") or v.startswith("[")) else
+            repr(v)
             for k, v in code_input.items()
         }
-        function_params_string = ", ".join([f"{k}={repr(parsed_input[k])}" for k in parsed_input])
-        function_call = f"print({function_name}({function_params_string}))\n"
-        full_code_to_call = user_code + '\n\n' + function_call
-
-        execution_result = execute_code_in_container(
-            'python',
-            full_code_to_call
-        )
+        function_params_string = ", ".join([f"{k}={parameter_source[k]}" for k in parameter_source])
+        function_call_expression = f"{function_name}({function_params_string})"
 
-        rv_dict = _compute_eval_result_dict(
-            execution_result=execution_result,
-            code_expected_output=code_expected_output,
-            function_params_string=function_call
-        )
-        results.append(rv_dict)
-
-    return results
+        compiled_test_cases.append({
+            'code_prefix': '',
+            'result_expression': function_call_expression,
+            'expected_output': parse_expected_output(tc_dict['expected_output']),
+            'test_input_to_code': f"print({function_call_expression})\n",
+        })
+    return compiled_test_cases
 
 
-def run_test_cases_with_class(user_code: str, class_name: str, test_case_list: list):
-    results = []
+def compile_test_cases_with_class(class_name: str, test_case_list: list) -> list:
+    compiled_test_cases = []
     for tc_dict in test_case_list:
         tc_method = tc_dict['method_to_test']
         tc_input_dict = tc_dict['input']
@@ -241,9 +304,7 @@ def run_test_cases_with_class(user_code: str, class_name: str, test_case_list: l
                     for k in tc_input_dict
                 ]).strip()
                 input_class_object_initialization_string = f"{class_name}({input_class_param_initialization_string})"
-                method_call_string = f"print({class_call_string}.{tc_method}({input_class_object_initialization_string}))"
-                
-                full_code = user_code + '\n\n' + method_call_string
+                method_call_expression = f"{class_call_string}.{tc_method}({input_class_object_initialization_string})"
 
         else:
             # method_call_input_param_string = ", ".join([repr(tc_input_dict[k]) for k in tc_input_dict]).strip()
@@ -251,21 +312,51 @@ def run_test_cases_with_class(user_code: str, class_name: str, test_case_list: l
                 repr(value) if isinstance(value, (str, int, float, bool)) else str(value)
                 for value in tc_input_dict.values()
             ]).strip()
-            method_call_string = f"print({class_call_string}.{tc_method}({method_call_input_param_string}))"
+            method_call_expression = f"{class_call_string}.{tc_method}({method_call_input_param_string})"
 
-            full_code = user_code + "\n\n" + method_call_string
+        compiled_test_cases.append({
+            'code_prefix': '',
+            'result_expression': method_call_expression,
+            'expected_output': parse_expected_output(tc_dict['expected_output']),
+            'test_input_to_code': f"print({method_call_expression})",
+        })
+    return compiled_test_cases
 
-        # code execution
-        execution_result = execute_code_in_container(
-            language = 'python',
-            code = full_code
-        )
 
-        rv_dict = _compute_eval_result_dict(
-            execution_result = execution_result,
-            code_expected_output = tc_dict['expected_output'],
-            function_params_string = method_call_string
-        )
-        results.append(rv_dict)
+def run_compiled_test_cases(user_code: str, compiled_test_cases: list, backend: Optional[str] = None, test_case_callback: Optional[Callable[[int, dict], None]] = None, fail_fast: bool = False, execution_order: Optional[list] = None, execution_profile: Optional[dict] = None):
+    """
+    Run compiled test cases (see `compile_test_cases_*`) against the user's
+    code and return one result dict per test case.
 
-    return results
+    See `_evaluate_test_programs` for `fail_fast` and `execution_order`, and
+    `_execute_test_programs` for `execution_profile`.
+    """
+    test_programs = [
+        {'code': compiled_test_case['code_prefix'] + user_code, 'result_expression': compiled_test_case['result_expression']}
+        for compiled_test_case in compiled_test_cases
+    ]
+    return _evaluate_test_programs(
+        test_programs,
+        [compiled_test_case['expected_output'] for compiled_test_case in compiled_test_cases],
+        [compiled_test_case['test_input_to_code'] for compiled_test_case in compiled_test_cases],
+        backend,
+        test_case_callback,
+        fail_fast,
+        execution_order,
+        execution_profile
+    )
+
+
+def run_test_cases_without_function(user_code: str, test_case_list: list, backend: Optional[str] = None, test_case_callback: Optional[Callable[[int, dict], None]] = None):
+    """
+    Run test cases for the given code and return results as a list of 'yes' or 'no'.
+    """
+    return run_compiled_test_cases(user_code, compile_test_cases_without_function(test_case_list), backend, test_case_callback)
+
+
+def run_test_cases_with_function(user_code: str, function_name: str, test_case_list: list, backend: Optional[str] = None, test_case_callback: Optional[Callable[[int, dict], None]] = None):
+    return run_compiled_test_cases(user_code, compile_test_cases_with_function(function_name, test_case_list), backend, test_case_callback)
+
+
+def run_test_cases_with_class(user_code: str, class_name: str, test_case_list: list, backend: Optional[str] = None, test_case_callback: Optional[Callable[[int, dict], None]] = None):
+    return run_compiled_test_cases(user_code, compile_test_cases_with_class(class_name, test_case_list), backend, test_case_callback)
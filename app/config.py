@@ -21,6 +21,72 @@ class Settings(BaseSettings):  # will load the .env file
         "https://www.companionai.dev"
     ]
 
+    # Code Execution
+    code_executor_backend: str = "docker"  # docker or subprocess
+    subprocess_executor_python: str = "python3"
+    subprocess_executor_memory_limit_bytes: int = 256 * 1024 * 1024
+    subprocess_executor_file_size_limit_bytes: int = 1024 * 1024
+    container_pool_enabled: bool = True
+    container_pool_size: int = 4
+    container_pool_max_reuse: int = 50
+    container_pool_health_check_interval: int = 30
+    container_fork_server_enabled: bool = False
+    sandbox_memory_limit_mb: int = 256
+    sandbox_cpu_quota: float = 0.5
+    sandbox_reaper_enabled: bool = True
+    sandbox_reaper_interval_seconds: int = 60
+    batched_test_harness_enabled: bool = True
+    harness_per_case_timeout: int = 10
+    parallel_test_execution_enabled: bool = True
+    test_case_max_workers: int = 4
+    max_concurrent_executions_per_host: int = 8
+    execution_output_max_bytes: int = 64 * 1024
+    harness_output_max_bytes_per_program: int = 16 * 1024
+    execution_timeout_multiplier: float = 5.0
+    execution_timeout_min_seconds: int = 1
+
+    # Execution Scheduling
+    execution_priority_queues_enabled: bool = True
+    execution_max_in_flight_per_user_interactive: int = 2
+    execution_max_in_flight_per_user_graded: int = 2
+    execution_max_in_flight_per_user_batch: int = 10
+    execution_in_flight_ttl_seconds: int = 10 * 60
+    execution_fair_share_window_seconds: int = 5 * 60
+    task_result_max_wait_seconds: int = 60
+    task_status_batch_max_size: int = 200
+    single_flight_enabled: bool = True
+    single_flight_ttl_seconds: int = 10 * 60
+    single_flight_wait_seconds: int = 2 * 60
+    idempotency_key_ttl_seconds: int = 24 * 60 * 60
+    admission_control_enabled: bool = True
+    admission_max_queue_depth: int = 200
+    admission_max_latency_seconds: float = 30.0
+    admission_latency_window_seconds: int = 60
+    admission_latency_sample_size: int = 200
+    admission_max_retry_after_seconds: int = 30
+
+    # Grading
+    grading_float_rel_tol: float = 1e-09
+    grading_float_abs_tol: float = 0.0
+    adaptive_test_ordering_history_limit: int = 200
+    adaptive_test_ordering_ttl_seconds: int = 10 * 60
+    preflight_cache_max_entries: int = 10000
+
+    # Performance Analysis
+    complexity_input_sizes: list[int] = [64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384]
+    complexity_time_limit_per_size: float = 1.0
+    performance_grading_default_input_size: int = 10000
+    performance_grading_time_limit: float = 5.0
+    performance_grading_min_time_seconds: float = 0.01
+    profiling_time_limit: float = 10.0
+    profiling_top_n: int = 5
+
+    # Grading Cache
+    grading_cache_enabled: bool = True
+    grading_cache_redis_db: int = 1
+    grading_cache_ttl_seconds: int = 7 * 24 * 60 * 60
+    grading_cache_max_entries: int = 50000
+
     class Config:
         env_file = ".env"
 
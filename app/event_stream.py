@@ -0,0 +1,77 @@
+import json
+from typing import AsyncGenerator
+
+import redis.asyncio as async_redis
+
+from app.config import settings
+from app.redis_client import get_redis_client
+
+
+EVENT_CHANNEL_PREFIX = "events:"
+EVENT_LOG_PREFIX = "events_log:"
+# How long the replay log of a stream is kept around after its last event
+EVENT_LOG_TTL_SECONDS = 10 * 60
+
+
+class RedisEventPublisher(object):
+    """
+    Publishes a sequence of JSON events for one stream (an execution, a
+    grading job, ...) to Redis.
+
+    Every event goes both to a pub/sub channel (for live subscribers) and to a
+    short-lived replay list (for subscribers that connect late). Events carry
+    a sequence number so subscribers can de-duplicate the two. The replay
+    list is kept `log_ttl_seconds` after the last event.
+    """
+
+    def __init__(self, stream_name: str, log_ttl_seconds: int = EVENT_LOG_TTL_SECONDS):
+        self.stream_name = stream_name
+        self.log_ttl_seconds = log_ttl_seconds
+        self.redis_client = get_redis_client()
+        self.sequence_number = 0
+
+    def publish(self, event: dict):
+        self.sequence_number += 1
+        event['seq'] = self.sequence_number
+        serialized_event = json.dumps(event, default=str)
+
+        pipeline = self.redis_client.pipeline()
+        pipeline.rpush(EVENT_LOG_PREFIX + self.stream_name, serialized_event)
+        pipeline.expire(EVENT_LOG_PREFIX + self.stream_name, self.log_ttl_seconds)
+        pipeline.publish(EVENT_CHANNEL_PREFIX + self.stream_name, serialized_event)
+        pipeline.execute()
+
+
+async def subscribe_to_events(stream_name: str, final_event_types: tuple) -> AsyncGenerator[dict, None]:
+    """
+    Yield the events of a stream, replaying whatever was published before the
+    subscription, until an event of one of `final_event_types`.
+    """
+    redis_client = async_redis.Redis.from_url(settings.redis_backend_url)
+    pubsub = redis_client.pubsub()
+    try:
+        # Subscribe before reading the replay log, so no event falls in between
+        await pubsub.subscribe(EVENT_CHANNEL_PREFIX + stream_name)
+
+        last_sequence_number = 0
+        for serialized_event in await redis_client.lrange(EVENT_LOG_PREFIX + stream_name, 0, -1):
+            event = json.loads(serialized_event)
+            last_sequence_number = event['seq']
+            yield event
+            if event['type'] in final_event_types:
+                return
+
+        async for message in pubsub.listen():
+            if message['type'] != 'message':
+                continue
+            event = json.loads(message['data'])
+            if event['seq'] <= last_sequence_number:
+                continue
+            last_sequence_number = event['seq']
+            yield event
+            if event['type'] in final_event_types:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await redis_client.aclose()
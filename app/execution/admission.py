@@ -0,0 +1,151 @@
+import json
+import math
+import time
+import threading
+import statistics
+
+import redis
+
+from app.config import settings
+from app.redis_client import get_redis_client
+from app.execution.scheduling import EXECUTION_QUEUE_GRADED, EXECUTION_QUEUE_INTERACTIVE, EXECUTION_QUEUES, get_queue_depth
+
+
+LATENCY_SAMPLES_KEY_PREFIX = "execution_admission:latency:"
+# Where every task waits when the priority queues are disabled
+CELERY_DEFAULT_QUEUE = "celery"
+# How long a capacity state is reused within a process, so an overload
+# doesn't turn every rejected request into more Redis round trips
+CAPACITY_STATE_CACHE_SECONDS = 1.0
+
+
+class ExecutionCapacityError(Exception):
+    def __init__(self, message: str, retry_after_seconds: int):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+def record_execution_latency(queue_name: str, latency_seconds: float):
+    """
+    Keep the time an execution took from submission to completion (queueing
+    included) among the queue's recent latency samples.
+    """
+    samples_key = LATENCY_SAMPLES_KEY_PREFIX + queue_name
+    try:
+        pipeline = get_redis_client().pipeline()
+        pipeline.lpush(samples_key, json.dumps([time.time(), latency_seconds]))
+        pipeline.ltrim(samples_key, 0, settings.admission_latency_sample_size - 1)
+        pipeline.expire(samples_key, settings.admission_latency_window_seconds * 2)
+        pipeline.execute()
+    except redis.RedisError:
+        pass
+
+
+def _get_recent_latencies(redis_client: redis.Redis, queue_name: str) -> list:
+    oldest_sample_time = time.time() - settings.admission_latency_window_seconds
+    latencies = []
+    for serialized_sample in redis_client.lrange(LATENCY_SAMPLES_KEY_PREFIX + queue_name, 0, -1):
+        sample_time, latency_seconds = json.loads(serialized_sample)
+        if sample_time >= oldest_sample_time:
+            latencies.append(latency_seconds)
+    return latencies
+
+
+def _percentile(values: list, fraction: float) -> float:
+    sorted_values = sorted(values)
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def compute_capacity_state() -> dict:
+    """
+    How loaded the execution queues are: the tasks waiting per queue, the
+    recent submission-to-completion latency per queue (median and p95), and
+    whether new interactive runs are accepted (and if not, when to retry).
+
+    Interactive runs are refused once the queues they wait behind (graded
+    and interactive) hold `admission_max_queue_depth` tasks, or once recent
+    interactive runs took over `admission_max_latency_seconds` at the 95th
+    percentile.
+    """
+    redis_client = get_redis_client()
+    if settings.execution_priority_queues_enabled:
+        queue_names = EXECUTION_QUEUES
+        queue_names_ahead_of_interactive = [EXECUTION_QUEUE_GRADED, EXECUTION_QUEUE_INTERACTIVE]
+    else:
+        queue_names = [CELERY_DEFAULT_QUEUE]
+        queue_names_ahead_of_interactive = [CELERY_DEFAULT_QUEUE]
+
+    queue_states = {}
+    for queue_name in queue_names:
+        queue_states[queue_name] = {'queued': get_queue_depth(redis_client, queue_name)}
+    for queue_name in EXECUTION_QUEUES:
+        latencies = _get_recent_latencies(redis_client, queue_name)
+        queue_states.setdefault(queue_name, {})['latency_seconds'] = {
+            'samples': len(latencies),
+            'median': round(statistics.median(latencies), 3) if len(latencies) > 0 else None,
+            'p95': round(_percentile(latencies, 0.95), 3) if len(latencies) > 0 else None,
+        }
+
+    interactive_queue_depth = sum(queue_states[queue_name]['queued'] for queue_name in queue_names_ahead_of_interactive)
+    interactive_latency = queue_states[EXECUTION_QUEUE_INTERACTIVE]['latency_seconds']
+    overload_reason = None
+    if interactive_queue_depth >= settings.admission_max_queue_depth:
+        overload_reason = f"{interactive_queue_depth} executions are waiting to run."
+    elif interactive_latency['p95'] is not None and interactive_latency['p95'] > settings.admission_max_latency_seconds:
+        overload_reason = f"Executions are currently taking up to {round(interactive_latency['p95'])} seconds."
+
+    # By the time a run waiting now would have finished, the queue has moved
+    retry_after_seconds = None
+    if overload_reason is not None:
+        retry_after_seconds = min(
+            settings.admission_max_retry_after_seconds,
+            max(1, math.ceil(interactive_latency['median'] or 1))
+        )
+    return {
+        'accepting_interactive': overload_reason is None,
+        'overload_reason': overload_reason,
+        'retry_after_seconds': retry_after_seconds,
+        'interactive_queue_depth': interactive_queue_depth,
+        'max_queue_depth': settings.admission_max_queue_depth,
+        'max_latency_seconds': settings.admission_max_latency_seconds,
+        'queues': queue_states,
+    }
+
+
+_capacity_state = None
+_capacity_state_time = 0.0
+_capacity_state_lock = threading.Lock()
+
+
+def get_capacity_state() -> dict:
+    """
+    `compute_capacity_state`, reused for `CAPACITY_STATE_CACHE_SECONDS`.
+    """
+    global _capacity_state, _capacity_state_time
+    with _capacity_state_lock:
+        if _capacity_state is not None and time.monotonic() - _capacity_state_time < CAPACITY_STATE_CACHE_SECONDS:
+            return _capacity_state
+    capacity_state = compute_capacity_state()
+    with _capacity_state_lock:
+        _capacity_state = capacity_state
+        _capacity_state_time = time.monotonic()
+    return capacity_state
+
+
+def admit_interactive_execution():
+    """
+    Raise `ExecutionCapacityError` (with a retry-after hint) when the
+    execution queues are over capacity for a new interactive run. Runs are
+    admitted when admission control is disabled or Redis is unavailable.
+    """
+    if not settings.admission_control_enabled:
+        return
+    try:
+        capacity_state = get_capacity_state()
+    except redis.RedisError:
+        return
+    if not capacity_state['accepting_interactive']:
+        raise ExecutionCapacityError(
+            f"The code runners are busy: {capacity_state['overload_reason']} Try again shortly.",
+            retry_after_seconds = capacity_state['retry_after_seconds']
+        )
@@ -0,0 +1,83 @@
+import os
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+
+
+EXECUTION_SLOT_DIR = "/tmp/companion-execution-slots"
+SLOT_POLL_INTERVAL_IN_SECONDS = 0.05
+
+
+class ExecutionSlotTimeoutError(Exception):
+    pass
+
+
+@contextmanager
+def host_execution_slot(timeout: int = 30):
+    """
+    Hold one of the host-wide execution slots for the duration of the block.
+
+    Slots are `flock`-ed files shared by every process on the host (gunicorn
+    and Celery workers alike), so the number of concurrent sandbox executions
+    stays capped at `max_concurrent_executions_per_host` no matter how many
+    processes are fanning out test cases.
+    """
+    os.makedirs(EXECUTION_SLOT_DIR, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        for slot_number in range(settings.max_concurrent_executions_per_host):
+            slot_fd = os.open(os.path.join(EXECUTION_SLOT_DIR, f"slot-{slot_number}"), os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(slot_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(slot_fd)
+                continue
+
+            try:
+                yield slot_number
+            finally:
+                fcntl.flock(slot_fd, fcntl.LOCK_UN)
+                os.close(slot_fd)
+            return
+
+        if time.monotonic() >= deadline:
+            raise ExecutionSlotTimeoutError("All execution slots on this host are busy.")
+        time.sleep(SLOT_POLL_INTERVAL_IN_SECONDS)
+
+
+_test_case_executor = None
+_test_case_executor_pid = None
+_test_case_executor_lock = threading.Lock()
+
+
+def get_test_case_executor() -> ThreadPoolExecutor:
+    """
+    Process-wide bounded thread pool used to fan out test case executions.
+    """
+    global _test_case_executor, _test_case_executor_pid
+    with _test_case_executor_lock:
+        if _test_case_executor is None or _test_case_executor_pid != os.getpid():
+            _test_case_executor = ThreadPoolExecutor(
+                max_workers = settings.test_case_max_workers,
+                thread_name_prefix = "test-case"
+            )
+            _test_case_executor_pid = os.getpid()
+        return _test_case_executor
+
+
+def split_into_chunks(items: list, number_of_chunks: int) -> list:
+    """
+    Split `items` into at most `number_of_chunks` contiguous, evenly sized chunks.
+    """
+    number_of_chunks = max(1, min(number_of_chunks, len(items)))
+    chunk_size, remainder = divmod(len(items), number_of_chunks)
+    chunks, start = [], 0
+    for chunk_index in range(number_of_chunks):
+        end = start + chunk_size + (1 if chunk_index < remainder else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
@@ -0,0 +1,318 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import socket
+import threading
+from typing import Optional
+from contextlib import contextmanager
+
+import docker
+
+from app.config import settings
+from app.execution.workspace import CONTAINER_WORKSPACE_ROOT
+from app.execution.fork_server_client import FORK_SERVER_COMMAND, ForkServerConnection, ForkServerError
+
+
+# Sandbox limits shared by pooled and one-off containers
+SANDBOX_CONTAINER_KWARGS = {
+    "user": "nobody",
+    "read_only": True,
+    "network_mode": "none",
+    "pids_limit": 64,
+    "security_opt": ["no-new-privileges"],
+}
+
+CPU_PERIOD_MICROSECONDS = 100000
+
+
+def get_sandbox_resource_kwargs(memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None) -> dict:
+    """
+    Memory and CPU limits of a sandbox container (`cpu_quota` is in CPUs),
+    defaulting to the `sandbox_memory_limit_mb` and `sandbox_cpu_quota`
+    settings. Swap is off, so the memory limit is a hard one.
+    """
+    memory_limit = f"{memory_limit_mb or settings.sandbox_memory_limit_mb}m"
+    return {
+        "mem_limit": memory_limit,
+        "memswap_limit": memory_limit,
+        "cpu_period": CPU_PERIOD_MICROSECONDS,
+        "cpu_quota": int((cpu_quota or settings.sandbox_cpu_quota) * CPU_PERIOD_MICROSECONDS),
+    }
+
+# Every sandbox container and volume is labelled, so the reaper (see
+# `reaper.py`) can find them: its role, the process that created it and, for
+# one-off containers, the time by which it must be gone
+SANDBOX_LABEL = "companion.sandbox"
+SANDBOX_OWNER_LABEL = "companion.owner"
+SANDBOX_DEADLINE_LABEL = "companion.deadline"
+
+
+def get_sandbox_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def get_sandbox_labels(role: str, deadline: Optional[float] = None) -> dict:
+    labels = {
+        SANDBOX_LABEL: role,
+        SANDBOX_OWNER_LABEL: get_sandbox_owner(),
+    }
+    if deadline is not None:
+        labels[SANDBOX_DEADLINE_LABEL] = str(int(deadline))
+    return labels
+
+
+# Kills every process left behind by the previous execution (except the
+# container's init process and the killer itself).
+_KILL_STRAY_PROCESSES_SCRIPT = (
+    "import os, signal\n"
+    "me = os.getpid()\n"
+    "for p in os.listdir('/proc'):\n"
+    "    if p.isdigit() and int(p) not in (1, me):\n"
+    "        try:\n"
+    "            os.kill(int(p), signal.SIGKILL)\n"
+    "        except (ProcessLookupError, PermissionError):\n"
+    "            pass\n"
+)
+
+
+class PoolExhaustedError(Exception):
+    pass
+
+
+class PooledContainer(object):
+
+    def __init__(self, container, volume):
+        self.container = container
+        self.volume = volume
+        self.use_count = 0
+        self.last_health_check = time.monotonic()
+        self.fork_server_connection = None
+        self.broken = False
+        self.resource_kwargs = get_sandbox_resource_kwargs()
+
+
+class ContainerPool(object):
+    """
+    Pool of pre-started, locked-down sandbox containers.
+
+    Containers idle on `sleep infinity` and user code is run inside them with
+    `exec_run`, so an execution only pays for the interpreter start instead of
+    a full container boot. A container is replaced once it has served
+    `max_reuse` executions or fails a health check.
+
+    Each container gets its own workspace volume (the root filesystem stays
+    read-only); code is delivered per execution with `container_workspace`.
+
+    With `fork_server`, containers run the fork server (see `fork_server.py`)
+    instead of idling, and executions are sent to it over the container's
+    attached stdin with `lease_fork_server`, so they only pay for a fork. The
+    fork server cleans up after every execution itself.
+
+    Containers start with the default memory and CPU limits; a lease can ask
+    for others (see `get_sandbox_resource_kwargs`), which are applied to the
+    running container only when they differ from its current ones.
+    """
+
+    def __init__(self, image: str, size: int, max_reuse: int, health_check_interval: int, lease_timeout: int = 30, fork_server: bool = False):
+        self.image = image
+        self.size = size
+        self.max_reuse = max_reuse
+        self.health_check_interval = health_check_interval
+        self.lease_timeout = lease_timeout
+        self.fork_server = fork_server
+
+        self.client = docker.from_env()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._total = 0
+        self._closed = False
+
+    def start(self):
+        for _ in range(self.size):
+            self._replenish()
+
+    def _create_container(self) -> PooledContainer:
+        volume = self.client.volumes.create(
+            name = f"companion-workspace-{uuid.uuid4().hex}",
+            labels = get_sandbox_labels("pool")
+        )
+        if self.fork_server:
+            # The fork server's children work in private directories of /tmp
+            container_kwargs = {
+                "command": FORK_SERVER_COMMAND,
+                "stdin_open": True,
+                "tmpfs": {"/tmp": "rw,size=64m,mode=1777"},
+            }
+        else:
+            container_kwargs = {
+                "command": ["sleep", "infinity"],
+            }
+        try:
+            container = self.client.containers.run(
+                image = self.image,
+                volumes = {volume.name: {"bind": CONTAINER_WORKSPACE_ROOT, "mode": "rw"}},
+                working_dir = CONTAINER_WORKSPACE_ROOT,
+                detach = True,
+                init = True,
+                labels = get_sandbox_labels("pool"),
+                **container_kwargs,
+                **get_sandbox_resource_kwargs(),
+                **SANDBOX_CONTAINER_KWARGS
+            )
+        except docker.errors.DockerException:
+            volume.remove(force=True)
+            raise
+        return PooledContainer(container, volume)
+
+    def _replenish(self):
+        with self._lock:
+            if self._closed or self._total >= self.size:
+                return
+            self._total += 1
+        try:
+            pooled_container = self._create_container()
+        except docker.errors.DockerException:
+            with self._lock:
+                self._total -= 1
+            raise
+        self._idle.put(pooled_container)
+
+    def _replenish_in_background(self):
+        threading.Thread(target=self._replenish, daemon=True).start()
+
+    def _discard(self, pooled_container: PooledContainer):
+        with self._lock:
+            self._total -= 1
+        if pooled_container.fork_server_connection is not None:
+            pooled_container.fork_server_connection.close()
+        try:
+            pooled_container.container.remove(force=True)
+        except docker.errors.DockerException:
+            pass
+        try:
+            pooled_container.volume.remove(force=True)
+        except docker.errors.DockerException:
+            pass
+
+    def is_healthy(self, pooled_container: PooledContainer) -> bool:
+        try:
+            pooled_container.container.reload()
+            if pooled_container.container.status != "running":
+                return False
+            exit_code, _ = pooled_container.container.exec_run(["python", "-c", "pass"])
+        except docker.errors.DockerException:
+            return False
+        pooled_container.last_health_check = time.monotonic()
+        return exit_code == 0
+
+    def _reset(self, pooled_container: PooledContainer) -> bool:
+        if self.fork_server:
+            # Killing stray processes would kill the fork server too; it
+            # cleans up after every execution itself
+            return True
+        try:
+            exit_code, _ = pooled_container.container.exec_run(
+                ["python", "-c", _KILL_STRAY_PROCESSES_SCRIPT]
+            )
+        except docker.errors.DockerException:
+            return False
+        return exit_code == 0
+
+    def _acquire(self) -> PooledContainer:
+        deadline = time.monotonic() + self.lease_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PoolExhaustedError("No sandbox container became available.")
+            try:
+                pooled_container = self._idle.get(timeout=remaining)
+            except queue.Empty:
+                raise PoolExhaustedError("No sandbox container became available.")
+
+            health_check_due = (time.monotonic() - pooled_container.last_health_check) >= self.health_check_interval
+            if health_check_due and not self.is_healthy(pooled_container):
+                self._discard(pooled_container)
+                self._replenish_in_background()
+                continue
+            return pooled_container
+
+    def _release(self, pooled_container: PooledContainer):
+        pooled_container.use_count += 1
+        if self._closed or pooled_container.broken or pooled_container.use_count >= self.max_reuse or not self._reset(pooled_container):
+            self._discard(pooled_container)
+            self._replenish_in_background()
+        else:
+            self._idle.put(pooled_container)
+
+    def _apply_resource_limits(self, pooled_container: PooledContainer, memory_limit_mb: Optional[int], cpu_quota: Optional[float]):
+        resource_kwargs = get_sandbox_resource_kwargs(memory_limit_mb, cpu_quota)
+        if resource_kwargs != pooled_container.resource_kwargs:
+            pooled_container.container.update(**resource_kwargs)
+            pooled_container.resource_kwargs = resource_kwargs
+
+    @contextmanager
+    def lease(self, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None):
+        pooled_container = self._acquire()
+        try:
+            self._apply_resource_limits(pooled_container, memory_limit_mb, cpu_quota)
+            yield pooled_container.container
+        except docker.errors.DockerException:
+            pooled_container.broken = True
+            raise
+        finally:
+            self._release(pooled_container)
+
+    @contextmanager
+    def lease_fork_server(self, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None):
+        """
+        Lease a container and yield the connection to its fork server. The
+        container is discarded if the fork server was lost.
+        """
+        pooled_container = self._acquire()
+        try:
+            self._apply_resource_limits(pooled_container, memory_limit_mb, cpu_quota)
+            if pooled_container.fork_server_connection is None:
+                pooled_container.fork_server_connection = ForkServerConnection(pooled_container.container)
+            yield pooled_container.fork_server_connection
+        except (ForkServerError, docker.errors.DockerException):
+            pooled_container.broken = True
+            raise
+        finally:
+            self._release(pooled_container)
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                pooled_container = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled_container)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_container_pool(image: str) -> ContainerPool:
+    """
+    Return the process-wide pool, creating it on first use (and again after a
+    fork, since Docker client connections can't be shared across processes).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ContainerPool(
+                image = image,
+                size = settings.container_pool_size,
+                max_reuse = settings.container_pool_max_reuse,
+                health_check_interval = settings.container_pool_health_check_interval,
+                fork_server = settings.container_fork_server_enabled
+            )
+            _pool_pid = os.getpid()
+            _pool.start()
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,392 @@
+import os
+import time
+import signal
+import shutil
+import resource
+import selectors
+import subprocess
+import threading
+from typing import Optional, Callable
+
+import docker
+
+from app.config import settings
+from app.execution.container_pool import SANDBOX_CONTAINER_KWARGS, PoolExhaustedError, get_container_pool, get_sandbox_labels, get_sandbox_resource_kwargs
+from app.execution.fork_server_client import ForkServerError
+from app.execution.workspace import container_workspace, host_workspace
+from app.execution.output_stream import ExecutionOutputCapture
+
+
+OutputCallback = Callable[[str, str], None]
+
+LANGUAGE_CONFIG = {
+    "python": {
+        "docker_image": "python:3.12-slim",
+        "file_extension": ".py",
+        "exec_cmd": ["python"],
+    },
+}
+
+# One-off containers' output is streamed, so Docker only needs to keep a little
+CONTAINER_LOG_CONFIG = {"type": "json-file", "config": {"max-size": "1m", "max-file": "1"}}
+CONTAINER_EXIT_GRACE_SECONDS = 5
+
+
+# Unbuffered output, so streamed output arrives as it is printed
+EXECUTION_ENVIRONMENT = {
+    "PYTHONUNBUFFERED": "1",
+    "PYTHONDONTWRITEBYTECODE": "1",
+    "PYTHONIOENCODING": "utf-8",
+}
+
+
+def get_language_config(language: str) -> dict:
+    language_config = LANGUAGE_CONFIG.get(language)
+    if not language_config:
+        raise ValueError("Unsupported language")
+    return language_config
+
+
+class CodeExecutor(object):
+    """
+    Interface of a code execution backend.
+
+    `execute` runs `code` with the given time limit and returns
+    `{"success": bool, "output": str}` (plus `exit_code` when known, and
+    `out_of_memory` when the execution was killed for running out of memory).
+
+    Once the program ran, the result also has `stdout` and `stderr` on their
+    own and `output_truncated`: every output is capped at `max_output_bytes`
+    (the `execution_output_max_bytes` setting by default), keeping its start
+    and end around a truncation marker (see `ExecutionOutputCapture`).
+
+    `memory_limit_mb` and `cpu_quota` (in CPUs) override the sandbox's
+    default limits, where the backend supports them.
+    """
+    name = None
+
+    def execute(self, language: str, code: str, timeout: int, output_callback: Optional[OutputCallback] = None, max_output_bytes: Optional[int] = None, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None) -> dict:
+        raise NotImplementedError
+
+
+class DockerExecutor(CodeExecutor):
+    """
+    Runs code in a locked-down Docker container, either leased from the warm
+    pool (through the pool's fork server when it runs one) or started just
+    for this execution.
+    """
+    name = "docker"
+
+    def execute(self, language: str, code: str, timeout: int, output_callback: Optional[OutputCallback] = None, max_output_bytes: Optional[int] = None, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None) -> dict:
+        language_config = get_language_config(language)
+        code_file_name = f"submission_code{language_config['file_extension']}"
+        output_capture = ExecutionOutputCapture(
+            max_bytes = max_output_bytes or settings.execution_output_max_bytes,
+            output_callback = output_callback
+        )
+
+        if settings.container_pool_enabled and settings.container_fork_server_enabled and language == "python":
+            return self._execute_in_fork_server(
+                docker_image = language_config["docker_image"],
+                code = code,
+                timeout = timeout,
+                output_capture = output_capture,
+                memory_limit_mb = memory_limit_mb,
+                cpu_quota = cpu_quota
+            )
+        if settings.container_pool_enabled:
+            return self._execute_in_pooled_container(
+                docker_image = language_config["docker_image"],
+                code_file_name = code_file_name,
+                code = code,
+                exec_cmd = language_config["exec_cmd"],
+                timeout = timeout,
+                output_capture = output_capture,
+                memory_limit_mb = memory_limit_mb,
+                cpu_quota = cpu_quota
+            )
+        return self._execute_in_new_container(
+            docker_image = language_config["docker_image"],
+            code_file_name = code_file_name,
+            code = code,
+            exec_cmd = language_config["exec_cmd"],
+            timeout = timeout,
+            output_capture = output_capture,
+            memory_limit_mb = memory_limit_mb,
+            cpu_quota = cpu_quota
+        )
+
+    def _execute_in_pooled_container(self, docker_image: str, code_file_name: str, code: str, exec_cmd: list, timeout: int, output_capture: ExecutionOutputCapture, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None):
+        """
+        Run the code in a warm container leased from the pool, inside a private
+        workspace directory that is removed after the run.
+
+        Output is read as a stream, so the output capture's callback gets every
+        stdout/stderr chunk as soon as it is produced.
+        """
+        pool = get_container_pool(
+            image = docker_image
+        )
+        out_of_memory = False
+        try:
+            with pool.lease(memory_limit_mb=memory_limit_mb, cpu_quota=cpu_quota) as container:
+                with container_workspace(container, {code_file_name: code}) as workspace_dir:
+                    # `timeout` kills the interpreter (exit code 137) once the limit is hit
+                    exec_id = container.client.api.exec_create(
+                        container.id,
+                        ["timeout", "-s", "KILL", str(timeout)] + exec_cmd + [f"{workspace_dir}/{code_file_name}"],
+                        workdir = workspace_dir,
+                        user = "nobody",
+                        environment = EXECUTION_ENVIRONMENT
+                    )["Id"]
+                    start_time = time.monotonic()
+                    for stdout_chunk, stderr_chunk in container.client.api.exec_start(exec_id, stream=True, demux=True):
+                        for stream_name, chunk in (("stdout", stdout_chunk), ("stderr", stderr_chunk)):
+                            if chunk:
+                                output_capture.append(stream_name, chunk)
+                    exit_code = container.client.api.exec_inspect(exec_id)["ExitCode"]
+                    elapsed = time.monotonic() - start_time
+
+            if exit_code == 137:
+                # SIGKILL: from `timeout` once the limit is hit, otherwise from
+                # the OOM killer (the container's memory limit)
+                out_of_memory = elapsed < timeout - 0.5
+                if out_of_memory:
+                    output_capture.append_notice("\nExecution ran out of memory and was killed.")
+                else:
+                    output_capture.append_notice(f"\nExecution timed out after {timeout} seconds.")
+        except PoolExhaustedError as e:
+            return {"success": False, "output": f"Sandbox Unavailable: {str(e)}"}
+        except docker.errors.APIError as e:
+            return {"success": False, "output": f"Docker API Error: {str(e)}"}
+        except docker.errors.DockerException as e:
+            return {"success": False, "output": f"Docker Execution Error: {str(e)}"}
+
+        return {"success": exit_code == 0, **output_capture.result(), "exit_code": exit_code, "out_of_memory": out_of_memory}
+
+    def _execute_in_fork_server(self, docker_image: str, code: str, timeout: int, output_capture: ExecutionOutputCapture, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None):
+        """
+        Run the code in a child forked by the fork server of a warm container,
+        which already has the interpreter and common modules loaded.
+        """
+        pool = get_container_pool(
+            image = docker_image
+        )
+        try:
+            with pool.lease_fork_server(memory_limit_mb=memory_limit_mb, cpu_quota=cpu_quota) as fork_server_connection:
+                execution_result = fork_server_connection.execute(
+                    code = code,
+                    timeout = timeout,
+                    output_callback = lambda stream_name, text: output_capture.append(stream_name, text.encode("utf-8"))
+                )
+        except PoolExhaustedError as e:
+            return {"success": False, "output": f"Sandbox Unavailable: {str(e)}"}
+        except ForkServerError as e:
+            return {"success": False, "output": f"Sandbox Error: {str(e)}"}
+        except docker.errors.APIError as e:
+            return {"success": False, "output": f"Docker API Error: {str(e)}"}
+        except docker.errors.DockerException as e:
+            return {"success": False, "output": f"Docker Execution Error: {str(e)}"}
+
+        exit_code = execution_result["exit_code"]
+        # The fork server tells its own kills apart, so any other SIGKILL came
+        # from the OOM killer (the container's memory limit)
+        out_of_memory = exit_code == 137 and not execution_result["timed_out"]
+        if execution_result["timed_out"]:
+            output_capture.append_notice(f"\nExecution timed out after {timeout} seconds.")
+        elif out_of_memory:
+            output_capture.append_notice("\nExecution ran out of memory and was killed.")
+
+        return {"success": exit_code == 0, **output_capture.result(), "exit_code": exit_code, "out_of_memory": out_of_memory}
+
+    def _execute_in_new_container(self, docker_image: str, code_file_name: str, code: str, exec_cmd: list, timeout: int, output_capture: ExecutionOutputCapture, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None):
+        """
+        Run the code in a one-off container, with the code bind-mounted from a
+        private host directory.
+        """
+        # Output is streamed until the container exits, so the time limit is
+        # enforced inside the container
+        container_cmd = ["timeout", "-s", "KILL", str(timeout)] + exec_cmd + [f"/app/{code_file_name}"]
+
+        # Initialize Docker client
+        client = docker.from_env()
+
+        result = None
+        container = None
+        out_of_memory = False
+        error_message = None
+        with host_workspace({code_file_name: code}) as host_code_dir:
+            try:
+                container = client.containers.create(
+                    image = docker_image,
+                    command = container_cmd,
+                    volumes = {host_code_dir: {"bind": "/app", "mode": "ro"}}, # Mount the private workspace
+                    working_dir = "/app",
+                    environment = EXECUTION_ENVIRONMENT,
+                    log_config = CONTAINER_LOG_CONFIG,
+                    labels = get_sandbox_labels("oneoff", deadline=time.time() + timeout + CONTAINER_EXIT_GRACE_SECONDS),
+                    **get_sandbox_resource_kwargs(memory_limit_mb, cpu_quota),
+                    **SANDBOX_CONTAINER_KWARGS
+                )
+                # Attached before the start, so no output is missed; the output
+                # is read from the stream instead of the (unbounded) logs
+                output_stream = client.api.attach(container.id, stdout=True, stderr=True, stream=True, demux=True)
+                container.start()
+                for stdout_chunk, stderr_chunk in output_stream:
+                    for stream_name, chunk in (("stdout", stdout_chunk), ("stderr", stderr_chunk)):
+                        if chunk:
+                            output_capture.append(stream_name, chunk)
+                result = container.wait(
+                    timeout = timeout + CONTAINER_EXIT_GRACE_SECONDS
+                )
+                container.reload()
+                out_of_memory = container.attrs["State"].get("OOMKilled", False)
+                if out_of_memory:
+                    output_capture.append_notice("\nExecution ran out of memory and was killed.")
+                elif result["StatusCode"] == 137:
+                    output_capture.append_notice(f"\nExecution timed out after {timeout} seconds.")
+            except docker.errors.ContainerError as e:
+                error_message = f"Error: {str(e)}"
+            except docker.errors.APIError as e:
+                error_message = f"Docker API Error: {str(e)}"
+            except docker.errors.DockerException as e:
+                error_message = f"Docker Execution Error: {str(e)}"
+            except Exception as e:
+                error_message = f"Unexpected Error: {str(e)}"
+            finally:
+                # Clean up the container
+                if container is not None:
+                    container.remove(force=True)
+
+        if result is not None and error_message is None:
+            if result["StatusCode"] == 0:
+                return {"success": True, **output_capture.result(), "exit_code": result["StatusCode"]}
+            else:
+                return {"success": False, **output_capture.result(), "exit_code": result["StatusCode"], "out_of_memory": out_of_memory}
+        else:
+            return {"success": False, "output": error_message}
+
+
+class SubprocessExecutor(CodeExecutor):
+    """
+    Runs code in a local subprocess under resource limits (CPU time, address
+    space, file size, open files), inside a fresh network namespace when
+    unprivileged user namespaces are available.
+
+    Much cheaper than a container, but only as strong as rlimits: meant for
+    trusted, high-volume practice runs, tests and benchmarks.
+    """
+    name = "subprocess"
+
+    _network_namespace_supported = None
+    _network_namespace_probe_lock = threading.Lock()
+
+    @classmethod
+    def _network_isolation_prefix(cls) -> list:
+        with cls._network_namespace_probe_lock:
+            if cls._network_namespace_supported is None:
+                unshare_path = shutil.which("unshare")
+                cls._network_namespace_supported = unshare_path is not None and subprocess.run(
+                    [unshare_path, "--user", "--net", "true"],
+                    stdout = subprocess.DEVNULL,
+                    stderr = subprocess.DEVNULL
+                ).returncode == 0
+        if cls._network_namespace_supported:
+            return ["unshare", "--user", "--net", "--"]
+        return []
+
+    @staticmethod
+    def _limit_resources(cpu_time_limit: int, memory_limit: int):
+        """
+        Runs in the child between fork and exec.
+        """
+        file_size_limit = settings.subprocess_executor_file_size_limit_bytes
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_time_limit, cpu_time_limit + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (file_size_limit, file_size_limit))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    def execute(self, language: str, code: str, timeout: int, output_callback: Optional[OutputCallback] = None, max_output_bytes: Optional[int] = None, memory_limit_mb: Optional[int] = None, cpu_quota: Optional[float] = None) -> dict:
+        if language != "python":
+            raise ValueError("Unsupported language")
+
+        language_config = get_language_config(language)
+        code_file_name = f"submission_code{language_config['file_extension']}"
+
+        # There's no CPU quota for a subprocess; only the memory limit applies
+        memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb is not None else settings.subprocess_executor_memory_limit_bytes
+
+        with host_workspace({code_file_name: code}) as workspace_dir:
+            cmd = self._network_isolation_prefix() + [
+                settings.subprocess_executor_python, "-I", os.path.join(workspace_dir, code_file_name)
+            ]
+            try:
+                process = subprocess.Popen(
+                    cmd,
+                    cwd = workspace_dir,
+                    env = {"PATH": "/usr/local/bin:/usr/bin:/bin", **EXECUTION_ENVIRONMENT},
+                    stdin = subprocess.DEVNULL,
+                    stdout = subprocess.PIPE,
+                    stderr = subprocess.PIPE,
+                    start_new_session = True,
+                    preexec_fn = lambda: self._limit_resources(timeout, memory_limit)
+                )
+            except OSError as e:
+                return {"success": False, "output": f"Subprocess Execution Error: {str(e)}"}
+
+            output_capture = ExecutionOutputCapture(
+                max_bytes = max_output_bytes or settings.execution_output_max_bytes,
+                output_callback = output_callback
+            )
+            timed_out = False
+            deadline = time.monotonic() + timeout
+
+            selector = selectors.DefaultSelector()
+            selector.register(process.stdout, selectors.EVENT_READ, "stdout")
+            selector.register(process.stderr, selectors.EVENT_READ, "stderr")
+            while len(selector.get_map()) > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                for key, _ in selector.select(timeout=remaining):
+                    chunk = os.read(key.fileobj.fileno(), 65536)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        continue
+                    output_capture.append(key.data, chunk)
+            selector.close()
+
+            if timed_out:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+        # Report signals the way `timeout`/Docker do (128 + signal number)
+        exit_code = process.returncode if process.returncode >= 0 else 128 - process.returncode
+        if timed_out or exit_code in (128 + signal.SIGKILL, 128 + signal.SIGXCPU):
+            output_capture.append_notice(f"\nExecution timed out after {timeout} seconds.")
+
+        return {"success": exit_code == 0, **output_capture.result(), "exit_code": exit_code}
+
+
+EXECUTOR_BACKENDS = {
+    DockerExecutor.name: DockerExecutor,
+    SubprocessExecutor.name: SubprocessExecutor,
+}
+
+
+def get_executor(backend: Optional[str] = None) -> CodeExecutor:
+    """
+    Return the executor for `backend`, defaulting to the deployment-wide
+    `code_executor_backend` setting.
+    """
+    backend = backend or settings.code_executor_backend
+    if backend not in EXECUTOR_BACKENDS:
+        raise ValueError(f"Unknown code executor backend: {backend}")
+    return EXECUTOR_BACKENDS[backend]()
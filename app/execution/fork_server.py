@@ -0,0 +1,192 @@
+"""
+Fork server executed *inside* pooled sandbox containers.
+
+This file only depends on the standard library: its source is the command
+of the container (see `app/execution/container_pool.py`). It imports the
+standard library modules course exercises commonly use once, then reads one
+JSON request per line on stdin (`{"code": str, "timeout": int}`) and runs
+each in a forked, resource-limited child, so an execution costs a fork
+instead of an interpreter start and its imports.
+
+For every request it writes JSON lines on stdout: `{"type": "output",
+"stream": "stdout" | "stderr", "data": str}` as the program prints, then
+`{"type": "exit", "exit_code": int, "timed_out": bool}`. Signals are
+reported the way `timeout`/Docker do (128 + signal number).
+
+Nothing outlives an execution: the child runs in a private temporary
+directory that is removed afterwards, and every process it left behind is
+killed before the next request is read.
+"""
+import io
+import os
+import sys
+import json
+import time
+import codecs
+import select
+import shutil
+import signal
+import resource
+import tempfile
+import traceback
+
+# Preloaded for the children, which inherit them already imported
+import re
+import math
+import heapq
+import bisect
+import random
+import string
+import typing
+import decimal
+import fractions
+import operator
+import functools
+import itertools
+import statistics
+import dataclasses
+import collections
+import datetime
+import copy
+
+CODE_FILE_NAME = "submission_code.py"
+FILE_SIZE_LIMIT_BYTES = 1024 * 1024
+OPEN_FILES_LIMIT = 64
+READ_CHUNK_SIZE = 65536
+
+
+def _write_message(message):
+    data = (json.dumps(message) + "\n").encode("utf-8")
+    while data:
+        written = os.write(1, data)
+        data = data[written:]
+
+
+def _run_in_child(code, timeout, workspace_dir, stdout_fd, stderr_fd):
+    """
+    Runs in the forked child; never returns.
+    """
+    exit_code = 1
+    try:
+        os.setsid()
+        devnull_fd = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+
+        resource.setrlimit(resource.RLIMIT_CPU, (timeout, timeout + 1))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (FILE_SIZE_LIMIT_BYTES, FILE_SIZE_LIMIT_BYTES))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (OPEN_FILES_LIMIT, OPEN_FILES_LIMIT))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+        # Unbuffered, like PYTHONUNBUFFERED, so output arrives as it's printed
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = io.TextIOWrapper(open(1, "wb", 0, closefd=False), encoding="utf-8", write_through=True)
+        sys.stderr = io.TextIOWrapper(open(2, "wb", 0, closefd=False), encoding="utf-8", write_through=True)
+
+        # Forked children would otherwise all draw the same random numbers
+        random.seed()
+
+        code_path = os.path.join(workspace_dir, CODE_FILE_NAME)
+        with open(code_path, "w") as f:
+            f.write(code)
+        os.chdir(workspace_dir)
+        sys.argv = [code_path]
+        sys.path[0] = workspace_dir
+
+        try:
+            exec(compile(code, code_path, "exec"), {"__name__": "__main__", "__file__": code_path, "__builtins__": __builtins__})
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException as e:
+            # Leave this server's frame out of the traceback
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+            exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def _kill_stray_processes():
+    """
+    Kill every process but the container's init process and this server.
+    """
+    me = os.getpid()
+    for p in os.listdir("/proc"):
+        if p.isdigit() and int(p) not in (1, me):
+            try:
+                os.kill(int(p), signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+
+def _serve(request):
+    code, timeout = request["code"], int(request["timeout"])
+    workspace_dir = tempfile.mkdtemp(prefix="companion-")
+    stdout_read_fd, stdout_write_fd = os.pipe()
+    stderr_read_fd, stderr_write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(stdout_read_fd)
+        os.close(stderr_read_fd)
+        _run_in_child(code, timeout, workspace_dir, stdout_write_fd, stderr_write_fd)
+    os.close(stdout_write_fd)
+    os.close(stderr_write_fd)
+
+    stream_names = {stdout_read_fd: "stdout", stderr_read_fd: "stderr"}
+    decoders = {fd: codecs.getincrementaldecoder("utf-8")(errors="replace") for fd in stream_names}
+    open_fds = set(stream_names)
+    timed_out = False
+    deadline = time.monotonic() + timeout
+    while open_fds:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready_fds, _, _ = select.select(list(open_fds), [], [], remaining)
+        for fd in ready_fds:
+            chunk = os.read(fd, READ_CHUNK_SIZE)
+            if not chunk:
+                open_fds.discard(fd)
+                continue
+            text = decoders[fd].decode(chunk)
+            if text:
+                _write_message({"type": "output", "stream": stream_names[fd], "data": text})
+
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    _, status = os.waitpid(pid, 0)
+    _kill_stray_processes()
+    for fd in stream_names:
+        os.close(fd)
+    shutil.rmtree(workspace_dir, ignore_errors=True)
+
+    exit_code = os.waitstatus_to_exitcode(status)
+    if exit_code < 0:
+        exit_code = 128 - exit_code
+    _write_message({"type": "exit", "exit_code": exit_code, "timed_out": timed_out})
+
+
+def main():
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        _serve(json.loads(line))
+
+
+if __name__ == "__main__":
+    main()
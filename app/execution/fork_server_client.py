@@ -0,0 +1,90 @@
+import os
+import json
+import struct
+from typing import Optional, Callable
+
+
+FORK_SERVER_PATH = os.path.join(os.path.dirname(__file__), "fork_server.py")
+
+with open(FORK_SERVER_PATH, "r") as f:
+    FORK_SERVER_SOURCE = f.read()
+
+# Command of pooled containers running the fork server
+FORK_SERVER_COMMAND = ["python", "-c", FORK_SERVER_SOURCE]
+
+# Docker's multiplexed attach stream: 8 byte frame headers, stream 1 is stdout
+_FRAME_HEADER = struct.Struct(">BxxxL")
+_STDOUT_STREAM = 1
+
+# How long past the execution's own time limit to wait for the fork server
+FORK_SERVER_REPLY_GRACE_SECONDS = 5
+
+
+class ForkServerError(Exception):
+    pass
+
+
+class ForkServerConnection(object):
+    """
+    Connection to the fork server running as the main process of a pooled
+    container (see `fork_server.py`), over the container's attached stdin and
+    stdout, so an execution needs neither a `docker exec` nor an interpreter
+    start.
+
+    Not thread-safe: a connection belongs to the container's current lease.
+    Once a `ForkServerError` was raised, the connection (and the container)
+    should be discarded.
+    """
+
+    def __init__(self, container):
+        attach_socket = container.attach_socket(params={"stdin": 1, "stdout": 1, "stream": 1})
+        self._socket = getattr(attach_socket, "_sock", attach_socket)
+        self._attach_socket = attach_socket
+        self._buffer = b""
+
+    def _read_exactly(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._socket.recv(size - len(data))
+            if not chunk:
+                raise ForkServerError("The fork server closed its connection.")
+            data += chunk
+        return data
+
+    def _read_message(self) -> dict:
+        while b"\n" not in self._buffer:
+            stream, size = _FRAME_HEADER.unpack(self._read_exactly(_FRAME_HEADER.size))
+            frame = self._read_exactly(size)
+            if stream == _STDOUT_STREAM:
+                self._buffer += frame
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def execute(self, code: str, timeout: int, output_callback: Optional[Callable[[str, str], None]] = None) -> dict:
+        """
+        Run `code` in a fresh child of the fork server, passing its output to
+        `output_callback(stream_name, text)` as it arrives. Returns
+        `{"exit_code": int, "timed_out": bool}`.
+        """
+        try:
+            self._socket.settimeout(timeout + FORK_SERVER_REPLY_GRACE_SECONDS)
+            self._socket.sendall((json.dumps({"code": code, "timeout": timeout}) + "\n").encode("utf-8"))
+            while True:
+                message = self._read_message()
+                if message["type"] == "exit":
+                    break
+                if output_callback is not None:
+                    output_callback(message["stream"], message["data"])
+        except (OSError, ValueError, KeyError) as e:
+            raise ForkServerError(f"Lost the fork server: {str(e)}")
+
+        return {
+            "exit_code": message["exit_code"],
+            "timed_out": message["timed_out"],
+        }
+
+    def close(self):
+        try:
+            self._attach_socket.close()
+        except OSError:
+            pass
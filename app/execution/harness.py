@@ -0,0 +1,107 @@
+import os
+import json
+from typing import Optional
+
+from app.config import settings
+from app.execution import harness_driver
+
+
+# Bump whenever a change to the harness can change grading results (it is part
+# of the grading cache key)
+HARNESS_VERSION = 5
+
+# Room in the harness' output for everything but the programs' own output
+# (which JSON escaping can grow up to 6 times)
+HARNESS_OUTPUT_ALLOWANCE_BYTES = 64 * 1024
+JSON_ESCAPING_MAX_GROWTH = 6
+
+HARNESS_DRIVER_PATH = os.path.join(os.path.dirname(__file__), "harness_driver.py")
+
+with open(HARNESS_DRIVER_PATH, "r") as f:
+    HARNESS_DRIVER_SOURCE = f.read()
+
+
+def build_harness_program(programs: list, per_case_timeout: int, fail_fast: bool = False, max_output_bytes_per_program: Optional[int] = None) -> str:
+    """
+    Bundle the harness driver and every test case program into a single
+    script, so all test cases run within one sandbox execution.
+
+    Every program is a `{"code": str, "result_expression": Optional[str]}`
+    dict; see `harness_driver` for how the result expression is reported.
+    Every program's output is capped at `max_output_bytes_per_program`
+    (the `harness_output_max_bytes_per_program` setting by default).
+    """
+    payload = {
+        "per_case_timeout": per_case_timeout,
+        "fail_fast": fail_fast,
+        "max_output_bytes_per_program": max_output_bytes_per_program or settings.harness_output_max_bytes_per_program,
+        "programs": programs,
+    }
+    return HARNESS_DRIVER_SOURCE + f"\n\nmain(json.loads({json.dumps(payload)!r}))\n"
+
+
+def get_harness_max_output_bytes(number_of_programs: int, max_output_bytes_per_program: Optional[int] = None) -> int:
+    """
+    Output cap for a harness execution: large enough that the harness'
+    result line is never truncated, since every program's output in it is
+    already capped.
+    """
+    return (
+        number_of_programs * (max_output_bytes_per_program or settings.harness_output_max_bytes_per_program) * JSON_ESCAPING_MAX_GROWTH
+        + HARNESS_OUTPUT_ALLOWANCE_BYTES
+    )
+
+
+def decode_result_value(encoded_value, hashable: bool = False):
+    """
+    Inverse of `harness_driver._encode_value`. Objects that were reported
+    through `str()` decode to that string.
+
+    With `hashable`, containers decode to their hashable counterparts (for set
+    members and dict keys).
+    """
+    if isinstance(encoded_value, list):
+        items = [decode_result_value(item, hashable) for item in encoded_value]
+        return tuple(items) if hashable else items
+    if not isinstance(encoded_value, dict):
+        return encoded_value
+
+    value_tag, value = encoded_value["t"], encoded_value["v"]
+    if value_tag == "tuple":
+        return tuple(decode_result_value(item, hashable) for item in value)
+    if value_tag == "set":
+        items = [decode_result_value(item, hashable=True) for item in value]
+        return frozenset(items) if hashable else set(items)
+    if value_tag == "dict":
+        return {
+            decode_result_value(k, hashable=True): decode_result_value(v)
+            for k, v in value
+        }
+    return value
+
+
+def parse_harness_output(execution_result: dict, number_of_programs: int) -> list:
+    """
+    Turn the harness' output into one execution result dict per program,
+    in the same shape `execute_code_in_container` returns, plus the decoded
+    `value` of the program's result expression when it produced one.
+    """
+    for line in reversed(execution_result["output"].splitlines()):
+        if line.startswith(harness_driver.RESULT_MARKER):
+            results = json.loads(line[len(harness_driver.RESULT_MARKER):])
+            if len(results) == number_of_programs:
+                for result in results:
+                    if "value" in result:
+                        result["value"] = decode_result_value(result["value"])
+                return results
+
+    # The harness itself failed (sandbox error, out of memory or global timeout)
+    if execution_result.get("out_of_memory"):
+        return [
+            {"success": False, "output": execution_result["output"], "error": "Out of memory: the sandbox was killed by the out-of-memory killer.", "out_of_memory": True}
+            for _ in range(number_of_programs)
+        ]
+    return [
+        {"success": False, "output": execution_result["output"], "error": "Test harness failed to complete."}
+        for _ in range(number_of_programs)
+    ]
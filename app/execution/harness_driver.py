@@ -0,0 +1,209 @@
+"""
+Test harness executed *inside* the sandbox.
+
+This file only depends on the standard library: its source is shipped into
+the container together with the test case programs (see
+`app/execution/harness.py`), and `main(payload)` runs each program in a
+forked child with its own timeout, printing one JSON result list on stdout.
+Every result carries the program's wall time, CPU time and peak RSS.
+With `fail_fast`, the programs after the first one that fails to run are
+skipped.
+
+A program may come with a `result_expression`, evaluated after the program
+ran. Its value is sent back to the harness on a dedicated pipe, in a typed
+JSON encoding (see `_encode_value`), so nothing the program prints can be
+mistaken for its result.
+
+Each program's output is capped at `max_output_bytes_per_program`, keeping
+its start and end around a truncation marker (like the executors do), so
+the JSON result list stays small whatever the programs print.
+
+Programs that run out of memory (a `MemoryError`, or a SIGKILL the harness
+didn't send, which inside a memory-capped container means the OOM killer)
+are reported with `out_of_memory`.
+"""
+import os
+import sys
+import json
+import time
+import select
+import signal
+import traceback
+
+RESULT_MARKER = "__COMPANION_HARNESS_RESULT__"
+MEMORY_ERROR_EXIT_CODE = 90
+OUTPUT_TRUNCATION_MARKER = "\n... [output truncated: {omitted_bytes} bytes omitted] ...\n"
+
+
+def _encode_value(value):
+    """
+    Encode a value as JSON-compatible data without losing its type: lists and
+    JSON scalars are kept as they are, every other container is tagged, and
+    any other object is reported through `str()` (what `print` would show).
+    """
+    value_type = type(value)
+    if value is None or value_type in (bool, int, float, str):
+        return value
+    if value_type is list:
+        return [_encode_value(item) for item in value]
+    if value_type is tuple:
+        return {"t": "tuple", "v": [_encode_value(item) for item in value]}
+    if value_type in (set, frozenset):
+        return {"t": "set", "v": [_encode_value(item) for item in value]}
+    if value_type is dict:
+        return {"t": "dict", "v": [[_encode_value(k), _encode_value(v)] for k, v in value.items()]}
+    return {"t": "object", "v": str(value)}
+
+
+def _send_result_value(result_fd, value):
+    try:
+        encoded_value = json.dumps(_encode_value(value))
+    except (RecursionError, ValueError):
+        encoded_value = json.dumps({"t": "object", "v": str(value)})
+    data = encoded_value.encode("utf-8")
+    while data:
+        data = data[os.write(result_fd, data):]
+
+
+def _run_program_in_child(code, result_expression, result_fd):
+    try:
+        program_globals = {"__name__": "__main__", "__builtins__": __builtins__}
+        exec(compile(code, "<submission>", "exec"), program_globals)
+        if result_expression is not None:
+            _send_result_value(result_fd, eval(compile(result_expression, "<test case>", "eval"), program_globals))
+        exit_code = 0
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        # Drop the harness' own frame from the traceback shown to the student
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        traceback.print_exception(exc_type, exc_value, exc_traceback.tb_next)
+        exit_code = MEMORY_ERROR_EXIT_CODE if isinstance(exc_value, MemoryError) else 1
+
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(exit_code)
+
+
+def _append_output(output, chunk, max_bytes):
+    """
+    Keep the first and the last `max_bytes / 2` bytes of a program's output.
+    """
+    head_room = max_bytes // 2 - len(output["head"])
+    if head_room > 0:
+        output["head"] += chunk[:head_room]
+        chunk = chunk[head_room:]
+    output["tail"] += chunk
+    excess = len(output["tail"]) - (max_bytes - max_bytes // 2)
+    if excess > 0:
+        del output["tail"][:excess]
+        output["omitted_bytes"] += excess
+
+
+def _output_text(output):
+    if output["omitted_bytes"] == 0:
+        return (output["head"] + output["tail"]).decode("utf-8", errors="replace")
+    return (
+        output["head"].decode("utf-8", errors="replace")
+        + OUTPUT_TRUNCATION_MARKER.format(omitted_bytes=output["omitted_bytes"])
+        + output["tail"].decode("utf-8", errors="replace")
+    )
+
+
+def _run_case(program, timeout, max_output_bytes):
+    read_fd, write_fd = os.pipe()
+    result_read_fd, result_write_fd = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    start_time = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        os.setpgid(0, 0)
+        os.close(read_fd)
+        os.close(result_read_fd)
+        os.dup2(write_fd, 1)
+        os.dup2(write_fd, 2)
+        os.close(write_fd)
+        _run_program_in_child(program["code"], program.get("result_expression"), result_write_fd)
+
+    os.close(write_fd)
+    os.close(result_write_fd)
+    output = {"head": bytearray(), "tail": bytearray(), "omitted_bytes": 0}
+    result_chunks = []
+    open_fds = {read_fd, result_read_fd}
+    timed_out = False
+    deadline = time.monotonic() + timeout
+    while open_fds:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select(list(open_fds), [], [], remaining)
+        for fd in ready:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                open_fds.discard(fd)
+                continue
+            if fd == read_fd:
+                _append_output(output, chunk, max_output_bytes)
+            else:
+                result_chunks.append(chunk)
+    os.close(read_fd)
+    os.close(result_read_fd)
+
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    _, status, rusage = os.wait4(pid, 0)
+    wall_time = time.monotonic() - start_time
+
+    result = {
+        "success": (not timed_out) and os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0,
+        "output": _output_text(output),
+        "metrics": {
+            "wall_time_ms": round(wall_time * 1000, 2),
+            "cpu_time_ms": round((rusage.ru_utime + rusage.ru_stime) * 1000, 2),
+            "peak_memory_kb": rusage.ru_maxrss,  # kilobytes on Linux
+        },
+    }
+    if output["omitted_bytes"] > 0:
+        result["output_truncated"] = True
+    if timed_out:
+        result["error"] = f"Execution timed out after {timeout} seconds."
+    elif os.WIFEXITED(status) and os.WEXITSTATUS(status) == MEMORY_ERROR_EXIT_CODE:
+        result["out_of_memory"] = True
+        result["error"] = "Out of memory: the program raised MemoryError."
+    elif os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGKILL:
+        result["out_of_memory"] = True
+        result["error"] = "Out of memory: the program was killed by the out-of-memory killer."
+    elif result["success"] and len(result_chunks) > 0:
+        result["value"] = json.loads(b"".join(result_chunks))
+    return result
+
+
+def main(payload):
+    per_case_timeout = payload["per_case_timeout"]
+    fail_fast = payload.get("fail_fast", False)
+    max_output_bytes_per_program = payload["max_output_bytes_per_program"]
+    results = []
+    failed = False
+    for program in payload["programs"]:
+        if fail_fast and failed:
+            results.append({"success": False, "output": "", "skipped": True})
+            continue
+        result = _run_case(program, per_case_timeout, max_output_bytes_per_program)
+        failed = not result["success"]
+        results.append(result)
+    sys.stdout.write(RESULT_MARKER + json.dumps(results) + "\n")
+    sys.stdout.flush()
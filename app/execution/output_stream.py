@@ -0,0 +1,147 @@
+import codecs
+from typing import AsyncGenerator, Optional, Callable
+
+from app.event_stream import RedisEventPublisher, subscribe_to_events
+
+
+OUTPUT_STREAM_PREFIX = "execution_output:"
+
+OUTPUT_TRUNCATION_MARKER = "\n... [output truncated: {omitted_bytes} bytes omitted] ...\n"
+STREAMING_TRUNCATION_MARKER = "\n... [output truncated: the rest of the output is not shown while the program runs] ...\n"
+
+
+class IncrementalOutputDecoder(object):
+    """
+    Decodes a stream of byte chunks per output stream, without splitting
+    multi-byte characters that straddle two chunks.
+    """
+
+    def __init__(self):
+        self._decoders = {}
+
+    def decode(self, stream_name: str, chunk: bytes, final: bool = False) -> str:
+        if stream_name not in self._decoders:
+            self._decoders[stream_name] = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        return self._decoders[stream_name].decode(chunk, final=final)
+
+
+class BoundedOutputBuffer(object):
+    """
+    Keeps the first and the last `max_bytes / 2` bytes written to a stream,
+    and counts the bytes dropped in between. The end of the output is kept
+    because that's where tracebacks (and the harness' results) are.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.omitted_bytes = 0
+
+    def append(self, chunk: bytes):
+        head_room = self.head_limit - len(self.head)
+        if head_room > 0:
+            self.head += chunk[:head_room]
+            chunk = chunk[head_room:]
+        if chunk:
+            self.tail += chunk
+            excess = len(self.tail) - self.tail_limit
+            if excess > 0:
+                del self.tail[:excess]
+                self.omitted_bytes += excess
+
+    @property
+    def truncated(self) -> bool:
+        return self.omitted_bytes > 0
+
+    def getvalue(self) -> str:
+        if not self.truncated:
+            return (self.head + self.tail).decode("utf-8", errors="replace")
+        return (
+            self.head.decode("utf-8", errors="replace")
+            + OUTPUT_TRUNCATION_MARKER.format(omitted_bytes=self.omitted_bytes)
+            + self.tail.decode("utf-8", errors="replace")
+        )
+
+
+class ExecutionOutputCapture(object):
+    """
+    Size-bounded capture of an execution's output: stdout and stderr each in
+    their own `BoundedOutputBuffer`, plus both interleaved as `output`, so
+    what a program prints can't grow worker memory or the stored results
+    beyond `max_bytes` per buffer.
+
+    Chunks are also passed on (decoded) to `output_callback` until
+    `max_bytes` were streamed, followed by a truncation notice.
+    """
+
+    def __init__(self, max_bytes: int, output_callback: Optional[Callable[[str, str], None]] = None):
+        self.max_bytes = max_bytes
+        self.output_callback = output_callback
+        self.buffers = {
+            "stdout": BoundedOutputBuffer(max_bytes),
+            "stderr": BoundedOutputBuffer(max_bytes),
+            "output": BoundedOutputBuffer(max_bytes),
+        }
+        self._decoder = IncrementalOutputDecoder()
+        self._streamed_bytes = 0
+
+    def append(self, stream_name: str, chunk: bytes):
+        self.buffers[stream_name].append(chunk)
+        self.buffers["output"].append(chunk)
+
+        if self.output_callback is None or self._streamed_bytes > self.max_bytes:
+            return
+        self._streamed_bytes += len(chunk)
+        if self._streamed_bytes <= self.max_bytes:
+            self.output_callback(stream_name, self._decoder.decode(stream_name, chunk))
+        else:
+            self.output_callback(stream_name, STREAMING_TRUNCATION_MARKER)
+
+    def append_notice(self, text: str):
+        """
+        Add a message of our own (like a timeout notice) to stderr; it is
+        always streamed.
+        """
+        data = text.encode("utf-8")
+        self.buffers["stderr"].append(data)
+        self.buffers["output"].append(data)
+        if self.output_callback is not None:
+            self.output_callback("stderr", text)
+
+    def result(self) -> dict:
+        return {
+            "output": self.buffers["output"].getvalue(),
+            "stdout": self.buffers["stdout"].getvalue(),
+            "stderr": self.buffers["stderr"].getvalue(),
+            "output_truncated": self.buffers["output"].truncated,
+        }
+
+
+class ExecutionOutputPublisher(RedisEventPublisher):
+    """
+    Publishes the output of a running execution as it is produced, followed
+    by a final `exit` event.
+    """
+
+    def __init__(self, task_id: str):
+        super().__init__(OUTPUT_STREAM_PREFIX + task_id)
+
+    def publish_output(self, stream_name: str, text: str):
+        if len(text) > 0:
+            self.publish({'type': stream_name, 'data': text})
+
+    def publish_exit(self, execution_result: dict):
+        self.publish({
+            'type': 'exit',
+            'success': execution_result['success'],
+            'exit_code': execution_result.get('exit_code'),
+        })
+
+
+def stream_execution_output(task_id: str) -> AsyncGenerator[dict, None]:
+    return subscribe_to_events(
+        stream_name = OUTPUT_STREAM_PREFIX + task_id,
+        final_event_types = ('exit',)
+    )
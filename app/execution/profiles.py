@@ -0,0 +1,33 @@
+from app.config import settings
+
+
+def get_default_execution_profile() -> dict:
+    """
+    The sandbox limits test cases run under unless their question overrides
+    them: `{"per_case_timeout", "memory_limit_mb", "cpu_quota",
+    "output_max_bytes"}` (the output cap is per test case).
+    """
+    return {
+        'per_case_timeout': settings.harness_per_case_timeout,
+        'memory_limit_mb': settings.sandbox_memory_limit_mb,
+        'cpu_quota': settings.sandbox_cpu_quota,
+        'output_max_bytes': settings.harness_output_max_bytes_per_program,
+    }
+
+
+def get_lecture_question_execution_profile(lecture_question) -> dict:
+    """
+    The default execution profile, with the limits the question sets (its
+    `execution_*` columns) taking precedence.
+    """
+    execution_profile = get_default_execution_profile()
+    question_overrides = {
+        'per_case_timeout': lecture_question.execution_timeout_seconds,
+        'memory_limit_mb': lecture_question.execution_memory_limit_mb,
+        'cpu_quota': lecture_question.execution_cpu_quota,
+        'output_max_bytes': lecture_question.execution_output_max_bytes,
+    }
+    for limit_name, limit in question_overrides.items():
+        if limit is not None:
+            execution_profile[limit_name] = limit
+    return execution_profile
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import socket
+import threading
+from typing import Optional
+
+import docker
+import redis
+
+from app.config import settings
+from app.redis_client import get_redis_client
+from app.execution.container_pool import SANDBOX_LABEL, SANDBOX_OWNER_LABEL, SANDBOX_DEADLINE_LABEL, get_sandbox_owner
+
+
+REAPER_REPORT_KEY_PREFIX = "sandbox_reaper:report:"
+
+# Containers are only reaped this long past their deadline, so the executor
+# that owns them gets to clean up first
+DEADLINE_GRACE_SECONDS = 30
+
+
+def _owner_is_alive(owner: str) -> Optional[bool]:
+    """
+    Whether the process that created a sandbox is still running, or None when
+    it ran on another host (and can't be checked from here).
+    """
+    hostname, _, pid = owner.rpartition(":")
+    if hostname != socket.gethostname() or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def reap_sandbox_containers(client: docker.DockerClient) -> dict:
+    """
+    Remove the sandbox containers (and workspace volumes) that outlived their
+    purpose:
+
+    - one-off containers still around past their deadline (a worker that hung
+      or crashed mid-execution);
+    - containers and volumes whose owning process is gone (a worker that
+      crashed without shutting its pool down).
+
+    Returns how many of each were removed.
+    """
+    report = {
+        'checked_containers': 0,
+        'removed_past_deadline': 0,
+        'removed_orphaned_containers': 0,
+        'removed_orphaned_volumes': 0,
+        'errors': 0,
+    }
+    now = time.time()
+
+    for container in client.containers.list(all=True, filters={"label": SANDBOX_LABEL}):
+        report['checked_containers'] += 1
+        labels = container.labels
+        deadline = labels.get(SANDBOX_DEADLINE_LABEL)
+        owner = labels.get(SANDBOX_OWNER_LABEL)
+        if deadline is not None and now > float(deadline) + DEADLINE_GRACE_SECONDS:
+            report_key = 'removed_past_deadline'
+        elif owner is not None and _owner_is_alive(owner) is False:
+            report_key = 'removed_orphaned_containers'
+        else:
+            continue
+
+        try:
+            container.remove(force=True)
+            report[report_key] += 1
+        except docker.errors.NotFound:
+            pass  # removed by its owner in the meantime
+        except docker.errors.APIError:
+            report['errors'] += 1
+
+    for volume in client.volumes.list(filters={"label": SANDBOX_LABEL}):
+        owner = (volume.attrs.get("Labels") or {}).get(SANDBOX_OWNER_LABEL)
+        if owner is None or _owner_is_alive(owner) is not False:
+            continue
+        try:
+            volume.remove(force=True)
+            report['removed_orphaned_volumes'] += 1
+        except docker.errors.NotFound:
+            pass
+        except docker.errors.APIError:
+            report['errors'] += 1  # still in use by a container
+
+    return report
+
+
+def publish_reaper_report(report: dict):
+    """
+    Keep the latest report of this process' reaper in Redis (see
+    `get_reaper_reports`).
+    """
+    reaper = get_sandbox_owner()
+    try:
+        get_redis_client().setex(
+            REAPER_REPORT_KEY_PREFIX + reaper,
+            settings.sandbox_reaper_interval_seconds * 3,
+            json.dumps({'reaper': reaper, 'reaped_at': time.time(), **report})
+        )
+    except redis.RedisError:
+        pass
+
+
+def get_reaper_reports() -> list:
+    """
+    The latest report of every running reaper.
+    """
+    redis_client = get_redis_client()
+    report_keys = list(redis_client.scan_iter(match=REAPER_REPORT_KEY_PREFIX + "*"))
+    if len(report_keys) == 0:
+        return []
+    return [
+        json.loads(report)
+        for report in redis_client.mget(report_keys)
+        if report is not None
+    ]
+
+
+class SandboxReaper(object):
+    """
+    Background thread running `reap_sandbox_containers` every
+    `interval_seconds`, publishing every report.
+    """
+
+    def __init__(self, interval_seconds: int):
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+
+    def _run(self):
+        client = docker.from_env()
+        while not self._stopped.wait(self.interval_seconds):
+            try:
+                report = reap_sandbox_containers(client)
+            except docker.errors.DockerException as e:
+                print(f"Sandbox reaper failed: {e}")
+                continue
+            publish_reaper_report(report)
+            if any(report[key] > 0 for key in ('removed_past_deadline', 'removed_orphaned_containers', 'removed_orphaned_volumes', 'errors')):
+                print(f"Sandbox reaper: {report}")
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+_reaper = None
+_reaper_pid = None
+_reaper_lock = threading.Lock()
+
+
+def start_sandbox_reaper() -> SandboxReaper:
+    """
+    Start this process' reaper, once (and again after a fork, since threads
+    don't survive it).
+    """
+    global _reaper, _reaper_pid
+    with _reaper_lock:
+        if _reaper is None or _reaper_pid != os.getpid():
+            _reaper = SandboxReaper(
+                interval_seconds = settings.sandbox_reaper_interval_seconds
+            )
+            _reaper_pid = os.getpid()
+            _reaper.start()
+        return _reaper
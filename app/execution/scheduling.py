@@ -0,0 +1,218 @@
+import time
+import hashlib
+from typing import Optional
+from contextlib import contextmanager
+
+import redis
+
+from app.config import settings
+from app.redis_client import get_redis_client
+
+
+# Celery queues of the execution tasks. A worker consuming several of them
+# drains them in this order (the Redis transport's "priority" queue order),
+# so graded submissions never wait behind a burst of "Run" clicks, and batch
+# jobs only run when nothing else is waiting.
+EXECUTION_QUEUE_GRADED = "execution.graded"
+EXECUTION_QUEUE_INTERACTIVE = "execution.interactive"
+EXECUTION_QUEUE_BATCH = "execution.batch"
+EXECUTION_QUEUES = [EXECUTION_QUEUE_GRADED, EXECUTION_QUEUE_INTERACTIVE, EXECUTION_QUEUE_BATCH]
+
+# Message priorities within a queue; with the Redis transport, 0 is served first
+EXECUTION_PRIORITY_STEPS = 10
+# The Redis transport keeps every priority (but 0) of a queue in its own list
+PRIORITY_QUEUE_KEY_SEPARATOR = "\x06\x16"
+# Priority steps per multiple of the fair share of execution time a user used
+PRIORITY_STEPS_PER_FAIR_SHARE = 2
+
+IN_FLIGHT_KEY_PREFIX = "execution_scheduler:in_flight:"
+USAGE_KEY_PREFIX = "execution_scheduler:usage:"
+IN_FLIGHT_LIMIT_RETRY_AFTER_SECONDS = 2
+
+
+def get_priority_queue_key(queue_name: str, priority: int) -> str:
+    return queue_name if priority == 0 else f"{queue_name}{PRIORITY_QUEUE_KEY_SEPARATOR}{priority}"
+
+
+def get_queue_depth(redis_client: redis.Redis, queue_name: str) -> int:
+    """
+    Number of tasks waiting in a queue, over all priorities.
+    """
+    pipeline = redis_client.pipeline()
+    for priority in range(EXECUTION_PRIORITY_STEPS):
+        pipeline.llen(get_priority_queue_key(queue_name, priority))
+    return sum(pipeline.execute())
+
+
+class UserInFlightLimitError(Exception):
+    def __init__(self, message: str, retry_after_seconds: int):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+def get_max_in_flight_per_user(queue_name: str) -> int:
+    return {
+        EXECUTION_QUEUE_GRADED: settings.execution_max_in_flight_per_user_graded,
+        EXECUTION_QUEUE_INTERACTIVE: settings.execution_max_in_flight_per_user_interactive,
+        EXECUTION_QUEUE_BATCH: settings.execution_max_in_flight_per_user_batch,
+    }[queue_name]
+
+
+class ExecutionScheduler(object):
+    """
+    Per-user admission and fair sharing for the execution queues.
+
+    Every user may have a bounded number of executions in flight (queued or
+    running) per queue; `acquire` rejects the ones over the limit. Within a
+    queue, tasks are prioritized by how much execution time their user used
+    recently, relative to the fair share of the users active in the window:
+    a user who used less than their share jumps ahead of one hammering "Run".
+
+    Execution time is accounted in two consecutive windows of
+    `window_seconds`, so usage decays within at most two windows. When Redis
+    is unavailable, every execution is admitted with the default priority.
+    """
+
+    def __init__(self, redis_client: redis.Redis, window_seconds: int, in_flight_ttl_seconds: int):
+        self.redis_client = redis_client
+        self.window_seconds = window_seconds
+        self.in_flight_ttl_seconds = in_flight_ttl_seconds
+
+    def _in_flight_key(self, user_key: str, queue_name: str) -> str:
+        return f"{IN_FLIGHT_KEY_PREFIX}{queue_name}:{user_key}"
+
+    def _usage_keys(self, queue_name: str) -> list:
+        window = int(time.time() // self.window_seconds)
+        return [f"{USAGE_KEY_PREFIX}{queue_name}:{window}", f"{USAGE_KEY_PREFIX}{queue_name}:{window - 1}"]
+
+    def get_fair_share_priority(self, user_key: str, queue_name: str) -> int:
+        """
+        0 for users that used no more than half their fair share of execution
+        time in the queue, one step lower per further half share used.
+        """
+        pipeline = self.redis_client.pipeline()
+        for usage_key in self._usage_keys(queue_name):
+            pipeline.hgetall(usage_key)
+        usage_per_user = {}
+        for window_usage in pipeline.execute():
+            for window_user_key, execution_seconds in window_usage.items():
+                window_user_key = window_user_key.decode("utf-8")
+                usage_per_user[window_user_key] = usage_per_user.get(window_user_key, 0.0) + float(execution_seconds)
+
+        total_usage = sum(usage_per_user.values())
+        if total_usage == 0:
+            return 0
+        fair_share = total_usage / len(usage_per_user)
+        user_usage = usage_per_user.get(user_key, 0.0)
+        return min(EXECUTION_PRIORITY_STEPS - 1, int(user_usage / fair_share * PRIORITY_STEPS_PER_FAIR_SHARE))
+
+    def acquire(self, user_key: str, queue_name: str) -> int:
+        """
+        Count a new execution of the user in flight, and return the Celery
+        priority to queue it with. Raises `UserInFlightLimitError` when the
+        user already has as many executions in flight as the queue allows.
+        """
+        in_flight_key = self._in_flight_key(user_key, queue_name)
+        try:
+            pipeline = self.redis_client.pipeline()
+            pipeline.incr(in_flight_key)
+            pipeline.expire(in_flight_key, self.in_flight_ttl_seconds)
+            in_flight, _ = pipeline.execute()
+            if in_flight <= get_max_in_flight_per_user(queue_name):
+                return self.get_fair_share_priority(user_key, queue_name)
+            self.redis_client.decr(in_flight_key)
+        except redis.RedisError:
+            return 0
+
+        raise UserInFlightLimitError(
+            f"You already have {in_flight - 1} executions running; wait for them to finish.",
+            retry_after_seconds = IN_FLIGHT_LIMIT_RETRY_AFTER_SECONDS
+        )
+
+    def release(self, user_key: str, queue_name: str, execution_seconds: float = 0.0):
+        """
+        Count an execution of the user as done, charging its execution time
+        to the user's usage.
+        """
+        in_flight_key = self._in_flight_key(user_key, queue_name)
+        usage_key = self._usage_keys(queue_name)[0]
+        try:
+            pipeline = self.redis_client.pipeline()
+            pipeline.decr(in_flight_key)
+            if execution_seconds > 0:
+                pipeline.hincrbyfloat(usage_key, user_key, execution_seconds)
+                pipeline.expire(usage_key, self.window_seconds * 2)
+            in_flight = pipeline.execute()[0]
+            if in_flight <= 0:
+                self.redis_client.delete(in_flight_key)
+        except redis.RedisError:
+            pass
+
+    @contextmanager
+    def running(self, user_key: Optional[str], queue_name: str):
+        """
+        Release the user's execution (acquired when it was queued) once the
+        block is done, charging the time it took.
+        """
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            if user_key is not None:
+                self.release(user_key, queue_name, time.monotonic() - start_time)
+
+    def stats(self) -> dict:
+        queue_stats = {}
+        for queue_name in EXECUTION_QUEUES:
+            pipeline = self.redis_client.pipeline()
+            for usage_key in self._usage_keys(queue_name):
+                pipeline.hlen(usage_key)
+            active_users_per_window = pipeline.execute()
+            queue_stats[queue_name] = {
+                'queued': get_queue_depth(self.redis_client, queue_name),
+                'max_in_flight_per_user': get_max_in_flight_per_user(queue_name),
+                'active_users': max(active_users_per_window),
+            }
+        return queue_stats
+
+
+def get_execution_user_key(user_id: Optional[str] = None, token: Optional[str] = None, client_host: Optional[str] = None) -> str:
+    """
+    Who an execution is accounted to: the user, else the bearer token (hashed,
+    so it isn't stored), else the client's address.
+    """
+    if user_id is not None:
+        return f"user:{user_id}"
+    if token is not None:
+        return "token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+    return f"host:{client_host}"
+
+
+def get_execution_scheduler() -> ExecutionScheduler:
+    return ExecutionScheduler(
+        redis_client = get_redis_client(),
+        window_seconds = settings.execution_fair_share_window_seconds,
+        in_flight_ttl_seconds = settings.execution_in_flight_ttl_seconds
+    )
+
+
+def submit_execution_task(task, queue_name: str, user_key: str, task_kwargs: dict, task_id: Optional[str] = None):
+    """
+    Queue a Celery execution task for the user: admitted by the scheduler,
+    on `queue_name` (when the priority queues are enabled) with the user's
+    fair share priority. The task gets the user's `scheduling_user_key` and
+    the `scheduling_queue_name` to release the execution with (see
+    `ExecutionScheduler.running`), and the time it was `submitted_at`.
+    """
+    execution_scheduler = get_execution_scheduler()
+    priority = execution_scheduler.acquire(user_key, queue_name)
+    try:
+        return task.apply_async(
+            kwargs = {**task_kwargs, 'scheduling_user_key': user_key, 'scheduling_queue_name': queue_name, 'submitted_at': time.time()},
+            queue = queue_name if settings.execution_priority_queues_enabled else None,
+            priority = priority,
+            task_id = task_id
+        )
+    except Exception:
+        execution_scheduler.release(user_key, queue_name)
+        raise
@@ -0,0 +1,83 @@
+import io
+import os
+import time
+import uuid
+import shutil
+import tarfile
+import tempfile
+from contextlib import contextmanager
+
+import docker
+
+
+# Mount point of the per-container workspace volume in pooled containers
+CONTAINER_WORKSPACE_ROOT = "/workspace"
+
+
+def _make_workspace_archive(workspace_name: str, files: dict) -> bytes:
+    """
+    Build an in-memory tar archive holding `files` under `workspace_name/`.
+    """
+    archive_buffer = io.BytesIO()
+    with tarfile.open(fileobj=archive_buffer, mode="w") as archive:
+        directory_info = tarfile.TarInfo(workspace_name)
+        directory_info.type = tarfile.DIRTYPE
+        directory_info.mode = 0o755
+        directory_info.mtime = int(time.time())
+        archive.addfile(directory_info)
+
+        for file_name, content in files.items():
+            data = content.encode("utf-8")
+            file_info = tarfile.TarInfo(f"{workspace_name}/{file_name}")
+            file_info.size = len(data)
+            file_info.mode = 0o444
+            file_info.mtime = int(time.time())
+            archive.addfile(file_info, io.BytesIO(data))
+
+    return archive_buffer.getvalue()
+
+
+@contextmanager
+def container_workspace(container, files: dict):
+    """
+    Deliver `files` into a private directory of a running container and
+    remove that directory once the execution is done.
+
+    Yields the workspace path inside the container.
+    """
+    workspace_name = uuid.uuid4().hex
+    workspace_dir = f"{CONTAINER_WORKSPACE_ROOT}/{workspace_name}"
+
+    container.put_archive(
+        CONTAINER_WORKSPACE_ROOT,
+        _make_workspace_archive(workspace_name, files)
+    )
+    try:
+        yield workspace_dir
+    finally:
+        try:
+            container.exec_run(["rm", "-rf", workspace_dir], user="root")
+        except docker.errors.DockerException:
+            pass
+
+
+@contextmanager
+def host_workspace(files: dict):
+    """
+    Write `files` into a unique host directory (for bind-mounting into a
+    one-off container) and delete it afterwards.
+
+    Yields the host directory path.
+    """
+    host_dir = tempfile.mkdtemp(prefix="companion-exec-")
+    try:
+        # Readable by the container's `nobody` user
+        os.chmod(host_dir, 0o755)
+        for file_name, content in files.items():
+            host_file = os.path.join(host_dir, file_name)
+            with open(host_file, "w") as f:
+                f.write(content)
+            os.chmod(host_file, 0o444)
+        yield host_dir
+    finally:
+        shutil.rmtree(host_dir, ignore_errors=True)
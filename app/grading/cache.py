@@ -0,0 +1,132 @@
+import json
+import time
+import hashlib
+from typing import Optional
+
+import redis
+
+from app.config import settings
+from app.redis_client import get_redis_client
+from app.execution.harness import HARNESS_VERSION
+from app.execution.profiles import get_lecture_question_execution_profile
+
+
+CACHE_KEY_PREFIX = "grading_cache:entry:"
+CACHE_INDEX_KEY = "grading_cache:index"
+CACHE_HITS_KEY = "grading_cache:hits"
+CACHE_MISSES_KEY = "grading_cache:misses"
+
+
+def normalize_user_code(user_code: str) -> str:
+    """
+    Normalize line endings and trailing whitespace, so cosmetic differences
+    don't defeat the cache.
+    """
+    lines = user_code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def compute_grading_cache_key(user_code: str, lecture_question, fail_fast: bool = False, analyze_complexity: bool = False, profile: bool = False, trace_memory: bool = False) -> str:
+    """
+    Content-address a grading run.
+
+    The question's test cases (and everything else that influences the result)
+    are part of the key, so editing a question's test cases automatically
+    invalidates its cached results.
+    """
+    key_material = json.dumps({
+        "harness_version": HARNESS_VERSION,
+        "user_code": normalize_user_code(user_code),
+        "test_case_list": lecture_question.test_case_list,
+        "test_function_name": lecture_question.test_function_name,
+        "function_name": lecture_question.function_name,
+        "class_name": lecture_question.class_name,
+        "correct_solution": lecture_question.correct_solution,
+        "executor_backend": lecture_question.executor_backend,
+        "execution_profile": get_lecture_question_execution_profile(lecture_question),
+        "fail_fast": fail_fast,
+        "analyze_complexity": analyze_complexity,
+        "profile": profile,
+        "trace_memory": trace_memory,
+        "performance_input_generator": lecture_question.performance_input_generator,
+        "performance_slowdown_threshold": lecture_question.performance_slowdown_threshold,
+        "performance_input_size": lecture_question.performance_input_size,
+    }, sort_keys=True)
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+class GradingCache(object):
+    """
+    Redis-backed cache of grading results (per test case results and tutor
+    feedback), with a TTL per entry and LRU eviction once more than
+    `max_entries` are stored.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl_seconds: int, max_entries: int):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def get(self, cache_key: str) -> Optional[dict]:
+        try:
+            cached_value = self.redis_client.get(CACHE_KEY_PREFIX + cache_key)
+            if cached_value is None:
+                self.redis_client.incr(CACHE_MISSES_KEY)
+                return None
+
+            pipeline = self.redis_client.pipeline()
+            pipeline.incr(CACHE_HITS_KEY)
+            pipeline.zadd(CACHE_INDEX_KEY, {cache_key: time.time()})  # mark as recently used
+            pipeline.execute()
+        except redis.RedisError:
+            return None
+
+        return json.loads(cached_value)
+
+    def set(self, cache_key: str, value: dict):
+        now = time.time()
+        try:
+            pipeline = self.redis_client.pipeline()
+            pipeline.setex(CACHE_KEY_PREFIX + cache_key, self.ttl_seconds, json.dumps(value))
+            pipeline.zadd(CACHE_INDEX_KEY, {cache_key: now})
+            # Forget index entries whose value has already expired
+            pipeline.zremrangebyscore(CACHE_INDEX_KEY, "-inf", now - self.ttl_seconds)
+            pipeline.zcard(CACHE_INDEX_KEY)
+            number_of_entries = pipeline.execute()[-1]
+
+            # Evict the least recently used entries
+            if number_of_entries > self.max_entries:
+                evicted_entries = self.redis_client.zpopmin(CACHE_INDEX_KEY, number_of_entries - self.max_entries)
+                if len(evicted_entries) > 0:
+                    self.redis_client.delete(*[
+                        CACHE_KEY_PREFIX + evicted_key.decode("utf-8")
+                        for evicted_key, _ in evicted_entries
+                    ])
+        except redis.RedisError:
+            pass
+
+    def stats(self) -> dict:
+        pipeline = self.redis_client.pipeline()
+        pipeline.get(CACHE_HITS_KEY)
+        pipeline.get(CACHE_MISSES_KEY)
+        pipeline.zcard(CACHE_INDEX_KEY)
+        hits, misses, number_of_entries = pipeline.execute()
+
+        hits, misses = int(hits or 0), int(misses or 0)
+        total_lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total_lookups, 4) if total_lookups > 0 else 0.0,
+            'entries': number_of_entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+        }
+
+
+def get_grading_cache() -> GradingCache:
+    return GradingCache(
+        redis_client = get_redis_client(db=settings.grading_cache_redis_db),
+        ttl_seconds = settings.grading_cache_ttl_seconds,
+        max_entries = settings.grading_cache_max_entries
+    )
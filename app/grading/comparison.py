@@ -0,0 +1,81 @@
+import ast
+import math
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_printed_output(printed_output: str):
+    """
+    Best-effort conversion of a program's printed output back into a value,
+    for programs that report their result by printing it.
+    """
+    actual_output = printed_output.strip()
+
+    if actual_output.lower() == "true":
+        return True
+    if actual_output.lower() == "false":
+        return False
+    if actual_output.lower() == "none":
+        return None
+
+    try:
+        return int(actual_output)
+    except ValueError:
+        pass
+    try:
+        return float(actual_output)
+    except ValueError:
+        pass
+
+    if actual_output.startswith(("(", "[", "{")):
+        try:
+            return ast.literal_eval(actual_output)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    return actual_output
+
+
+def parse_expected_output(expected_output):
+    """
+    Test cases store collections either as values or as their repr.
+    """
+    if isinstance(expected_output, str) and expected_output.startswith(("(", "[", "{")):
+        return ast.literal_eval(expected_output)
+    return expected_output
+
+
+def outputs_match(actual, expected, rel_tol: float = 1e-09, abs_tol: float = 0.0) -> bool:
+    """
+    Compare a program's result with the expected value.
+
+    Floats (at any nesting depth) are compared with `math.isclose`; lists and
+    tuples must have the same type and length, dicts the same keys, and
+    everything else must be equal. Walks both values once, without recursion,
+    so the cost is linear in the size of the output.
+    """
+    pending_pairs = [(actual, expected)]
+    while pending_pairs:
+        actual_value, expected_value = pending_pairs.pop()
+
+        if _is_number(actual_value) and _is_number(expected_value) and (isinstance(actual_value, float) or isinstance(expected_value, float)):
+            if math.isnan(actual_value) and math.isnan(expected_value):
+                continue
+            if not math.isclose(actual_value, expected_value, rel_tol=rel_tol, abs_tol=abs_tol):
+                return False
+
+        elif isinstance(expected_value, (list, tuple)):
+            if type(actual_value) is not type(expected_value) or len(actual_value) != len(expected_value):
+                return False
+            pending_pairs.extend(zip(actual_value, expected_value))
+
+        elif isinstance(expected_value, dict):
+            if not isinstance(actual_value, dict) or actual_value.keys() != expected_value.keys():
+                return False
+            pending_pairs.extend((actual_value[k], expected_value[k]) for k in expected_value)
+
+        elif actual_value != expected_value:
+            return False
+
+    return True
@@ -0,0 +1,88 @@
+import ast
+import json
+import hashlib
+import threading
+
+from sqlalchemy.orm import Session
+
+from app.models import LectureQuestion
+from app.code_execution_utils import compile_test_cases_without_function, compile_test_cases_with_function, compile_test_cases_with_class
+
+
+# (lecture question id, test case content hash) -> compiled test cases
+_compiled_test_case_cache = {}
+_compiled_test_case_cache_lock = threading.Lock()
+
+
+def compute_test_case_content_hash(lecture_question: LectureQuestion) -> str:
+    """
+    Hash of everything a question's compiled test cases are derived from, so
+    editing the test cases invalidates the compiled version.
+    """
+    key_material = json.dumps({
+        "test_case_list": lecture_question.test_case_list,
+        "test_function_name": lecture_question.test_function_name,
+        "function_name": lecture_question.function_name,
+        "class_name": lecture_question.class_name,
+    }, sort_keys=True)
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+def compile_lecture_question_test_cases(lecture_question: LectureQuestion) -> list:
+    tc_function_name = lecture_question.test_function_name
+    test_case_list = ast.literal_eval(lecture_question.test_case_list)
+
+    if tc_function_name == 'run_test_cases_without_function':
+        return compile_test_cases_without_function(
+            test_case_list = test_case_list
+        )
+    elif tc_function_name == 'run_test_cases_with_function':
+        return compile_test_cases_with_function(
+            function_name = lecture_question.function_name,
+            test_case_list = test_case_list
+        )
+    elif tc_function_name == 'run_test_cases_with_class':
+        return compile_test_cases_with_class(
+            class_name = lecture_question.class_name,
+            test_case_list = test_case_list
+        )
+    return None
+
+
+def get_compiled_test_cases(lecture_question: LectureQuestion) -> list:
+    """
+    Return the question's compiled test cases, compiling them on first use
+    (or after its test cases changed).
+    """
+    question_id = str(lecture_question.id)
+    cache_key = (question_id, compute_test_case_content_hash(lecture_question))
+    compiled_test_cases = _compiled_test_case_cache.get(cache_key)
+    if compiled_test_cases is not None:
+        return compiled_test_cases
+
+    compiled_test_cases = compile_lecture_question_test_cases(lecture_question)
+    if compiled_test_cases is not None:
+        with _compiled_test_case_cache_lock:
+            # Drop versions compiled from the question's previous test cases
+            for stale_key in [key for key in _compiled_test_case_cache if key[0] == question_id]:
+                del _compiled_test_case_cache[stale_key]
+            _compiled_test_case_cache[cache_key] = compiled_test_cases
+    return compiled_test_cases
+
+
+def preload_compiled_test_cases(db: Session) -> int:
+    """
+    Compile the test cases of every lecture question, so no submission pays
+    for it. Returns the number of questions compiled.
+    """
+    number_of_compiled_questions = 0
+    lecture_question_objects = db.query(LectureQuestion).filter(
+        LectureQuestion.test_case_list != None
+    ).all()
+    for lecture_question_object in lecture_question_objects:
+        try:
+            if get_compiled_test_cases(lecture_question_object) is not None:
+                number_of_compiled_questions += 1
+        except (ValueError, SyntaxError, KeyError) as e:
+            print(f"Could not compile the test cases of lecture question {lecture_question_object.id}: {e}")
+    return number_of_compiled_questions
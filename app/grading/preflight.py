@@ -0,0 +1,144 @@
+import ast
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+
+
+PREFLIGHT_SYNTAX_ERROR = "syntax_error"
+PREFLIGHT_MISSING_DEFINITION = "missing_definition"
+PREFLIGHT_UNSUPPORTED_IMPORT = "unsupported_import"
+
+# The sandbox only has the standard library, and no Tk (the image is slim)
+SANDBOX_UNAVAILABLE_STDLIB_MODULES = {"tkinter", "turtle", "turtledemo", "idlelib"}
+
+# code hash -> preflight result, least recently used first
+_preflight_cache = OrderedDict()
+_preflight_cache_lock = threading.Lock()
+
+
+def _preflight_issue(issue_type: str, message: str, node: Optional[ast.AST] = None, line: Optional[int] = None, column: Optional[int] = None) -> dict:
+    return {
+        'type': issue_type,
+        'message': message,
+        'line': getattr(node, 'lineno', line),
+        'column': getattr(node, 'col_offset', column),
+    }
+
+
+def _module_level_names(module: ast.Module) -> set:
+    """
+    Names bound at module level, including inside `if`/`try`/`for`/`with`
+    blocks (but not inside functions or classes).
+    """
+    names = set()
+    statements = list(module.body)
+    while len(statements) > 0:
+        statement = statements.pop()
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(statement.name)
+            continue
+
+        targets = []
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            for alias in statement.names:
+                names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(statement, ast.Assign):
+            targets = statement.targets
+        elif isinstance(statement, (ast.AnnAssign, ast.AugAssign, ast.For, ast.AsyncFor)):
+            targets = [statement.target]
+        elif isinstance(statement, (ast.With, ast.AsyncWith)):
+            targets = [item.optional_vars for item in statement.items if item.optional_vars is not None]
+        for target in targets:
+            names.update(node.id for node in ast.walk(target) if isinstance(node, ast.Name))
+
+        # Descend into the blocks of compound statements
+        for block_name in ('body', 'orelse', 'finalbody'):
+            statements.extend(getattr(statement, block_name, []))
+        for handler in getattr(statement, 'handlers', []):
+            statements.extend(handler.body)
+    return names
+
+
+def _find_unsupported_imports(module: ast.Module) -> list:
+    issues = []
+    for node in ast.walk(module):
+        if isinstance(node, ast.Import):
+            module_names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level > 0:
+                issues.append(_preflight_issue(PREFLIGHT_UNSUPPORTED_IMPORT, "Relative imports are not supported: your code runs as a single file.", node))
+                continue
+            module_names = [node.module]
+        else:
+            continue
+
+        for module_name in module_names:
+            top_level_module_name = module_name.split(".")[0]
+            if top_level_module_name in SANDBOX_UNAVAILABLE_STDLIB_MODULES:
+                issues.append(_preflight_issue(PREFLIGHT_UNSUPPORTED_IMPORT, f"The module '{top_level_module_name}' is not available here (there is no display).", node))
+            elif top_level_module_name not in sys.stdlib_module_names:
+                issues.append(_preflight_issue(PREFLIGHT_UNSUPPORTED_IMPORT, f"The module '{top_level_module_name}' is not available here: only the Python standard library can be imported.", node))
+    return issues
+
+
+def _run_preflight_check(user_code: str, function_name: Optional[str], class_name: Optional[str]) -> dict:
+    try:
+        module = ast.parse(user_code)
+    except SyntaxError as e:
+        return {
+            'ok': False,
+            'errors': [_preflight_issue(PREFLIGHT_SYNTAX_ERROR, f"{type(e).__name__}: {e.msg}", line=e.lineno, column=e.offset)],
+        }
+
+    errors = []
+    defined_names = _module_level_names(module)
+    if function_name is not None and function_name not in defined_names:
+        errors.append(_preflight_issue(PREFLIGHT_MISSING_DEFINITION, f"Your code must define a function named '{function_name}'."))
+    if class_name is not None and class_name not in defined_names:
+        errors.append(_preflight_issue(PREFLIGHT_MISSING_DEFINITION, f"Your code must define a class named '{class_name}'."))
+    errors.extend(_find_unsupported_imports(module))
+
+    return {
+        'ok': len(errors) == 0,
+        'errors': errors,
+    }
+
+
+def preflight_check(user_code: str, function_name: Optional[str] = None, class_name: Optional[str] = None) -> dict:
+    """
+    Statically check the user's code before running it anywhere: that it
+    parses, that it defines `function_name` / `class_name` (when given), and
+    that it only imports modules the sandbox has.
+
+    Returns `{"ok": bool, "errors": [{"type", "message", "line", "column"}]}`.
+    Results are cached by code hash, so checking on every keystroke is cheap.
+    """
+    cache_key = hashlib.sha256("\0".join([user_code, function_name or "", class_name or ""]).encode("utf-8")).hexdigest()
+    with _preflight_cache_lock:
+        preflight_result = _preflight_cache.get(cache_key)
+        if preflight_result is not None:
+            _preflight_cache.move_to_end(cache_key)
+            return preflight_result
+
+    preflight_result = _run_preflight_check(user_code, function_name, class_name)
+    with _preflight_cache_lock:
+        _preflight_cache[cache_key] = preflight_result
+        while len(_preflight_cache) > settings.preflight_cache_max_entries:
+            _preflight_cache.popitem(last=False)
+    return preflight_result
+
+
+def preflight_check_lecture_question(user_code: str, lecture_question) -> dict:
+    """
+    `preflight_check` against the function or class the question's test cases
+    call.
+    """
+    return preflight_check(
+        user_code = user_code,
+        function_name = lecture_question.function_name if lecture_question.test_function_name == 'run_test_cases_with_function' else None,
+        class_name = lecture_question.class_name if lecture_question.test_function_name == 'run_test_cases_with_class' else None
+    )
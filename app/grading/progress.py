@@ -0,0 +1,29 @@
+from typing import AsyncGenerator
+
+from app.event_stream import RedisEventPublisher, subscribe_to_events
+
+
+SUBMISSION_STREAM_PREFIX = "lecture_submission:"
+
+
+class LectureSubmissionProgressPublisher(RedisEventPublisher):
+    """
+    Publishes the grading progress of an asynchronous lecture submission,
+    followed by a final `complete` (or `error`) event.
+    """
+
+    def __init__(self, submission_id: str):
+        super().__init__(SUBMISSION_STREAM_PREFIX + submission_id)
+
+    def publish_complete(self, submission_data: dict):
+        self.publish({'type': 'complete', 'data': submission_data})
+
+    def publish_error(self, error_message: str):
+        self.publish({'type': 'error', 'error': error_message})
+
+
+def stream_lecture_submission_events(submission_id: str) -> AsyncGenerator[dict, None]:
+    return subscribe_to_events(
+        stream_name = SUBMISSION_STREAM_PREFIX + submission_id,
+        final_event_types = ('complete', 'error')
+    )
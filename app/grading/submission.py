@@ -0,0 +1,327 @@
+import json
+from typing import Optional, Callable
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import LectureQuestion, UserCreatedLectureQuestion, LectureMain, LectureCodeSubmissionHistory, UserLectureMain
+from app.llm import openai_wrapper
+from app.llm.prompt_utils import _prepare_solution_feedback_prompt
+from app.code_execution_utils import run_compiled_test_cases
+from app.grading.compiled_test_cases import get_compiled_test_cases
+from app.grading.cache import get_grading_cache, compute_grading_cache_key
+from app.grading.preflight import preflight_check_lecture_question
+from app.execution.profiles import get_lecture_question_execution_profile
+from app.performance.complexity import estimate_lecture_question_time_complexity
+from app.performance.grading import grade_relative_performance
+from app.performance.profiling import profile_lecture_submission, format_profile_summary, trace_lecture_submission_memory, format_memory_trace_summary
+
+
+ProgressCallback = Callable[[dict], None]
+
+
+def run_lecture_question_test_cases(user_code: str, lecture_question: LectureQuestion, test_case_callback: Optional[Callable[[int, dict], None]] = None, fail_fast: bool = False, test_case_order: Optional[list] = None):
+    compiled_test_cases = get_compiled_test_cases(lecture_question)
+    if compiled_test_cases is None:
+        return None
+
+    # Code that can't run is failed on every test case without a container
+    preflight_result = preflight_check_lecture_question(
+        user_code = user_code,
+        lecture_question = lecture_question
+    )
+    if not preflight_result['ok']:
+        error_message = "\n".join(issue['message'] for issue in preflight_result['errors'])
+        tc_results = []
+        for test_case_index in range(len(compiled_test_cases)):
+            rv_dict = {
+                'correct': 'no',
+                'error': error_message,
+                'preflight_errors': preflight_result['errors']
+            }
+            if test_case_callback is not None:
+                test_case_callback(test_case_index, rv_dict)
+            tc_results.append(rv_dict)
+        return tc_results
+
+    return run_compiled_test_cases(
+        user_code = user_code,
+        compiled_test_cases = compiled_test_cases,
+        backend = lecture_question.executor_backend,
+        test_case_callback = test_case_callback,
+        fail_fast = fail_fast,
+        execution_order = test_case_order,
+        execution_profile = get_lecture_question_execution_profile(lecture_question)
+    )
+
+
+def grade_lecture_submission(user_code: str, lecture_question: LectureQuestion, op_ai_wrapper: openai_wrapper.OpenAIWrapper, progress_callback: Optional[ProgressCallback] = None, fail_fast: bool = False, test_case_order: Optional[list] = None, analyze_complexity: bool = False, profile: bool = False, trace_memory: bool = False) -> dict:
+    """
+    Run the question's test cases against the user's code and generate the
+    tutor feedback for it.
+
+    Identical resubmissions are served from the grading cache without running
+    any container or calling the LLM, and code that fails the preflight check
+    (see `preflight_check`) fails every test case without running any
+    container.
+
+    `progress_callback(event)` is called with a `test_case_complete` event for
+    every test case as soon as its result is known, a `test_cases_complete`
+    event once all of them ran, and a `feedback_ready` event once the tutor
+    feedback has been generated.
+
+    With `fail_fast`, grading stops at the first test case that fails to run
+    (the remaining ones are reported as skipped); `test_case_order` is the
+    order to run the test cases in (see `get_adaptive_test_case_order`).
+
+    With `analyze_complexity`, a solution that passes all test cases also gets
+    its time complexity estimated and compared with the reference solution.
+    For questions with a `performance_slowdown_threshold`, a solution that
+    passes all test cases is also timed against the reference solution (see
+    `grade_relative_performance`).
+
+    With `profile`, the submission is also run under a profiler, and a summary
+    of its hottest functions and lines goes to the tutor and the response.
+    With `trace_memory`, it's also run with allocation tracing, and its peak
+    memory and top allocating lines go to the tutor and the response.
+    """
+    def _report_progress(event: dict):
+        if progress_callback is not None:
+            progress_callback(event)
+
+    def _report_test_case_result(test_case_index: int, rv_dict: dict):
+        _report_progress({
+            'type': 'test_case_complete',
+            'test_case_index': test_case_index,
+            'result': rv_dict
+        })
+
+    grading_cache = None
+    if settings.grading_cache_enabled:
+        grading_cache = get_grading_cache()
+        grading_cache_key = compute_grading_cache_key(
+            user_code = user_code,
+            lecture_question = lecture_question,
+            fail_fast = fail_fast,
+            analyze_complexity = analyze_complexity,
+            profile = profile,
+            trace_memory = trace_memory
+        )
+        cached_grading_result = grading_cache.get(grading_cache_key)
+        if cached_grading_result is not None:
+            for test_case_index, rv_dict in enumerate(cached_grading_result['tc_results']):
+                _report_test_case_result(test_case_index, rv_dict)
+            _report_progress({'type': 'test_cases_complete', 'all_tests_passed': cached_grading_result['all_tests_passed']})
+            if cached_grading_result.get('performance_result') is not None:
+                _report_progress({'type': 'performance_result_ready', 'performance_result': cached_grading_result['performance_result']})
+            if cached_grading_result.get('profile_result') is not None:
+                _report_progress({'type': 'profile_ready', 'profile_result': cached_grading_result['profile_result']})
+            if cached_grading_result.get('memory_trace_result') is not None:
+                _report_progress({'type': 'memory_trace_ready', 'memory_trace_result': cached_grading_result['memory_trace_result']})
+            if cached_grading_result.get('complexity_analysis') is not None:
+                _report_progress({'type': 'complexity_analysis_ready', 'complexity_analysis': cached_grading_result['complexity_analysis']})
+            _report_progress({'type': 'feedback_ready', 'ai_response': cached_grading_result['ai_response_string']})
+            return cached_grading_result
+
+    tc_results = run_lecture_question_test_cases(
+        user_code = user_code,
+        lecture_question = lecture_question,
+        test_case_callback = _report_test_case_result,
+        fail_fast = fail_fast,
+        test_case_order = test_case_order
+    )
+
+    all_tests_passed = True
+    for rslt in tc_results:
+        if rslt['correct'] != 'yes':
+            all_tests_passed = False
+            break
+    _report_progress({'type': 'test_cases_complete', 'all_tests_passed': all_tests_passed})
+
+    # Nothing to profile in code that can't run
+    passed_preflight_check = not any('preflight_errors' in rslt for rslt in tc_results)
+
+    performance_result = None
+    if all_tests_passed:
+        performance_result = grade_relative_performance(
+            user_code = user_code,
+            lecture_question = lecture_question
+        )
+        if performance_result is not None:
+            _report_progress({'type': 'performance_result_ready', 'performance_result': performance_result})
+
+    profile_result = None
+    if profile and passed_preflight_check:
+        profile_result = profile_lecture_submission(
+            user_code = user_code,
+            lecture_question = lecture_question
+        )
+        _report_progress({'type': 'profile_ready', 'profile_result': profile_result})
+
+    memory_trace_result = None
+    if trace_memory and passed_preflight_check:
+        memory_trace_result = trace_lecture_submission_memory(
+            user_code = user_code,
+            lecture_question = lecture_question
+        )
+        _report_progress({'type': 'memory_trace_ready', 'memory_trace_result': memory_trace_result})
+
+    complexity_analysis = None
+    if analyze_complexity and all_tests_passed:
+        complexity_analysis = estimate_lecture_question_time_complexity(
+            user_code = user_code,
+            lecture_question = lecture_question
+        )
+        _report_progress({'type': 'complexity_analysis_ready', 'complexity_analysis': complexity_analysis})
+
+    # The execution metrics go into the prompt as their own list
+    serialized_test_case_results = json.dumps([
+        {k: v for k, v in rslt.items() if k != 'execution_metrics'}
+        for rslt in tc_results
+    ], indent=2, default=str)
+    serialized_test_case_metrics = json.dumps([
+        rslt.get('execution_metrics')
+        for rslt in tc_results
+    ], indent=2)
+    solution_fb_prompt = _prepare_solution_feedback_prompt(
+        user_code = user_code,
+        correct_solution = lecture_question.correct_solution,
+        test_case_result_boolean = all_tests_passed,
+        test_case_result_list_str = serialized_test_case_results,
+        test_case_metrics_list_str = serialized_test_case_metrics,
+        performance_result_str = json.dumps(performance_result) if performance_result is not None else None,
+        profile_summary_str = format_profile_summary(profile_result) if profile_result is not None else None,
+        memory_trace_summary_str = format_memory_trace_summary(memory_trace_result) if memory_trace_result is not None else None
+    )
+
+    tc_results_output_list = []
+    for eval_dict in tc_results:
+        if 'program_output' in eval_dict:
+            program_output = str(eval_dict['program_output'])
+            expected_output = str(eval_dict['expected_output'])
+            eval_dict['program_output'] = program_output
+            eval_dict['expected_output'] = expected_output
+            tc_results_output_list.append(eval_dict)
+        else:
+            tc_results_output_list.append(eval_dict)
+
+    ai_response = op_ai_wrapper.generate_sync_response(
+        prompt = solution_fb_prompt,
+        return_in_json = False
+    )
+    ai_response_string = ai_response.choices[0].message.content
+    _report_progress({'type': 'feedback_ready', 'ai_response': ai_response_string})
+
+    grading_result = {
+        'tc_results': tc_results_output_list,
+        'all_tests_passed': all_tests_passed,
+        'ai_response_string': ai_response_string,
+        'performance_result': performance_result,
+        'profile_result': profile_result,
+        'memory_trace_result': memory_trace_result,
+        'complexity_analysis': complexity_analysis
+    }
+    if grading_cache is not None:
+        grading_cache.set(grading_cache_key, grading_result)
+
+    return grading_result
+
+
+def record_lecture_submission(db: Session, user_code: str, grading_result: dict, user_created_lecture_question_object: UserCreatedLectureQuestion, parent_lecture_question_object: LectureQuestion, custom_user_id: str) -> dict:
+    """
+    Save the submission to the user's history, mark the question (and the
+    lecture, once all its questions are passed) as complete, and return the
+    submission response data.
+    """
+    tc_results = grading_result['tc_results']
+    all_tests_passed = grading_result['all_tests_passed']
+    ai_response_string = grading_result['ai_response_string']
+
+    lc_submission_history_object = LectureCodeSubmissionHistory(
+        code = user_code,
+        test_case_boolean_result = all_tests_passed,
+        program_output_list = str(tc_results),
+        test_case_metrics_list = json.dumps([rslt.get('execution_metrics') for rslt in tc_results]),
+        ai_feedback_response_string = ai_response_string,
+        user_created_lecture_question_object_id = user_created_lecture_question_object.id
+    )
+    db.add(lc_submission_history_object)
+    db.commit()
+    db.refresh(lc_submission_history_object)
+    
+    # if true --> update
+    if all_tests_passed:
+
+        user_created_lecture_question_object.complete = True
+        db.add(user_created_lecture_question_object)
+        db.commit()
+        db.refresh(user_created_lecture_question_object)
+
+        parent_lm_object = db.query(LectureMain).filter(
+            LectureMain.id == parent_lecture_question_object.lecture_main_object_id
+        ).first()
+        # fetch all lm objects with lec-number
+        all_current_lm_objects = db.query(LectureMain).filter(
+            LectureMain.number == parent_lm_object.number
+        ).all()
+
+        # fetch lecture questions for lm object
+        total_questions_passed = 0
+        # total_questions_count = len(all_current_lm_objects)
+        total_questions_count = db.query(LectureQuestion).filter(
+            LectureQuestion.lecture_main_object_id == parent_lm_object.id
+        ).count()
+        for current_lm_obj in all_current_lm_objects:
+            all_current_lq_objects = db.query(LectureQuestion).filter(
+                LectureQuestion.lecture_main_object_id == current_lm_obj.id
+            ).all()
+            for crt_lecture_q_obj in all_current_lq_objects:
+                # filter for current user and lecture_question
+                user_completed_lecture_q_object = db.query(UserCreatedLectureQuestion).filter(
+                    UserCreatedLectureQuestion.lecture_question_object_id == crt_lecture_q_obj.id,
+                    UserCreatedLectureQuestion.custom_user_id == custom_user_id,
+                    UserCreatedLectureQuestion.complete == True
+                ).first()
+                if user_completed_lecture_q_object is not None:
+                    total_questions_passed += 1
+
+        current_lecture_completed = False
+        print(f"Total Questions Passed: {total_questions_passed} || Total Questions Count: {total_questions_count}")
+        if (total_questions_passed >= total_questions_count):
+            current_lecture_completed = True
+
+        # filter for current user and lecture object
+        existing_user_lecture_main_obj = db.query(UserLectureMain).filter(
+            UserLectureMain.lecture_main_object_id == parent_lecture_question_object.lecture_main_object_id,
+            UserLectureMain.custom_user_id == custom_user_id
+        ).first()
+
+        if existing_user_lecture_main_obj is not None:
+            existing_user_lecture_main_obj.complete = current_lecture_completed
+            db.add(existing_user_lecture_main_obj)
+            db.commit()
+            db.refresh(existing_user_lecture_main_obj)
+        else:
+            user_lec_main_object = UserLectureMain(
+                complete = current_lecture_completed,
+                custom_user_id = custom_user_id,
+                lecture_main_object_id = parent_lecture_question_object.lecture_main_object_id,
+            )
+            db.add(user_lec_main_object)
+            db.commit()
+            db.refresh(user_lec_main_object)
+
+    return {
+        'lc_submission_history_object_id': lc_submission_history_object.id,
+        'lc_submission_history_object_created': lc_submission_history_object.created_at,
+        'lc_submission_history_object_boolean_result': lc_submission_history_object.test_case_boolean_result,
+        'lc_submission_history_code': lc_submission_history_object.code,
+
+        'result_list': tc_results,
+        'all_tests_passed': all_tests_passed,
+        'ai_response': ai_response_string,
+        'performance_result': grading_result.get('performance_result'),
+        'profile_result': grading_result.get('profile_result'),
+        'memory_trace_result': grading_result.get('memory_trace_result'),
+        'complexity_analysis': grading_result.get('complexity_analysis')
+    }
@@ -0,0 +1,87 @@
+import ast
+import time
+import threading
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import LectureQuestion, UserCreatedLectureQuestion, LectureCodeSubmissionHistory
+from app.grading.compiled_test_cases import get_compiled_test_cases
+
+
+# lecture question id -> (computed at, execution order)
+_test_case_order_cache = {}
+_test_case_order_cache_lock = threading.Lock()
+
+
+def compute_test_case_failure_rates(db: Session, lecture_question: LectureQuestion, number_of_test_cases: int) -> list:
+    """
+    Failure rate of each of the question's test cases over its most recent
+    submissions (from `LectureCodeSubmissionHistory`).
+
+    Submissions recorded with a different number of test cases (before the
+    question's test cases were edited) and skipped test cases don't count.
+    """
+    failure_counts = [0] * number_of_test_cases
+    run_counts = [0] * number_of_test_cases
+
+    submission_history_rows = db.query(LectureCodeSubmissionHistory.program_output_list).join(
+        UserCreatedLectureQuestion,
+        LectureCodeSubmissionHistory.user_created_lecture_question_object_id == UserCreatedLectureQuestion.id
+    ).filter(
+        UserCreatedLectureQuestion.lecture_question_object_id == lecture_question.id
+    ).order_by(
+        LectureCodeSubmissionHistory.created_at.desc()
+    ).limit(settings.adaptive_test_ordering_history_limit).all()
+
+    for (program_output_list,) in submission_history_rows:
+        try:
+            tc_results = ast.literal_eval(program_output_list)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            continue
+        if not isinstance(tc_results, list) or len(tc_results) != number_of_test_cases:
+            continue
+
+        for test_case_index, rslt in enumerate(tc_results):
+            if not isinstance(rslt, dict) or rslt.get('skipped'):
+                continue
+            run_counts[test_case_index] += 1
+            if rslt.get('correct') != 'yes':
+                failure_counts[test_case_index] += 1
+
+    return [
+        failure_count / run_count if run_count > 0 else 0.0
+        for failure_count, run_count in zip(failure_counts, run_counts)
+    ]
+
+
+def get_adaptive_test_case_order(db: Session, lecture_question: LectureQuestion) -> Optional[list]:
+    """
+    Test case indices ordered by historical failure rate (highest first), so a
+    failing submission fails as early as possible in fail-fast mode. Ties keep
+    the question's own order.
+
+    The order is recomputed at most every `adaptive_test_ordering_ttl_seconds`.
+    """
+    compiled_test_cases = get_compiled_test_cases(lecture_question)
+    if compiled_test_cases is None:
+        return None
+    number_of_test_cases = len(compiled_test_cases)
+
+    question_id = str(lecture_question.id)
+    cached_entry = _test_case_order_cache.get(question_id)
+    if cached_entry is not None:
+        computed_at, execution_order = cached_entry
+        if time.monotonic() - computed_at < settings.adaptive_test_ordering_ttl_seconds and len(execution_order) == number_of_test_cases:
+            return execution_order
+
+    failure_rates = compute_test_case_failure_rates(
+        db = db,
+        lecture_question = lecture_question,
+        number_of_test_cases = number_of_test_cases
+    )
+    execution_order = sorted(range(number_of_test_cases), key=lambda test_case_index: -failure_rates[test_case_index])
+    with _test_case_order_cache_lock:
+        _test_case_order_cache[question_id] = (time.monotonic(), execution_order)
+    return execution_order
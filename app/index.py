@@ -1,28 +1,44 @@
 import os
+import time
+import asyncio
 from typing import Optional, Generator
 import ast
 from datetime import datetime
 import json
 from json import JSONDecodeError
-import docker
 from celery import Celery
+from celery.signals import worker_process_init
 from celery.result import AsyncResult
 from sqlalchemy import desc
 from sqlalchemy.orm import Session
 
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.database import SessionLocal
 from app.llm import prompts, openai_wrapper
-from app.models import UserOAuth, CustomUser, UserCreatedPlaygroundQuestion, PlaygroundCode, UserCreatedPlaygroundQuestion, PlaygroundChatConversation, LandingPageEmail, LectureQuestion, UserCreatedLectureQuestion, UserPlaygroundLectureCode, LecturePlaygroundChatConversation, LectureMain, LectureCodeSubmissionHistory, ProblemSetQuestion, PlaygroundProblemSetChatConversation, UserLectureMain
-from app.pydantic_schemas import NotRequiredAnonUserSchema, RequiredAnonUserSchema, UpdateQuestionSchema, CodeExecutionRequestSchema, SaveCodeSchema, SaveLandingPageEmailSchema, FetchQuestionDetailsSchema, ValidateAuthZeroUserSchema, FetchLessonQuestionDetailSchema, FetchLectureDetailSchema, LectureQuestionSubmissionSchema, ProblemSetFetchSchema
+from app.models import UserOAuth, CustomUser, InitialPlaygroundQuestion, UserCreatedPlaygroundQuestion, PlaygroundCode, UserCreatedPlaygroundQuestion, PlaygroundChatConversation, LandingPageEmail, LectureQuestion, UserCreatedLectureQuestion, UserPlaygroundLectureCode, LecturePlaygroundChatConversation, LectureMain, LectureCodeSubmissionHistory, ProblemSetQuestion, PlaygroundProblemSetChatConversation, UserLectureMain
+from app.pydantic_schemas import NotRequiredAnonUserSchema, RequiredAnonUserSchema, UpdateQuestionSchema, CodeExecutionRequestSchema, SaveCodeSchema, SaveLandingPageEmailSchema, FetchQuestionDetailsSchema, ValidateAuthZeroUserSchema, FetchLessonQuestionDetailSchema, FetchLectureDetailSchema, LectureQuestionSubmissionSchema, ProblemSetFetchSchema, TimeComplexityAnalysisSchema, PreflightCheckSchema, TaskStatusBatchSchema
 from app.config import settings
 from app.utils import create_anon_user_object, _get_random_initial_pg_question, get_user_object, get_optional_token, clean_question_input_output_list, clean_question_test_case_list
-from app.llm.prompt_utils import _prepate_tutor_prompt, _prepare_solution_feedback_prompt
+from app.llm.prompt_utils import _prepate_tutor_prompt
 from app.scripts.verify_auth_zero_jwt import verify_jwt
-from app.code_execution_utils import run_test_cases_without_function, run_test_cases_with_function, run_test_cases_with_class
+from app import code_execution_utils
+from app.grading.cache import get_grading_cache
+from app.execution.output_stream import ExecutionOutputPublisher, stream_execution_output
+from app.execution.reaper import start_sandbox_reaper, get_reaper_reports
+from app.execution.admission import ExecutionCapacityError, admit_interactive_execution, record_execution_latency, get_capacity_state
+from app.execution.scheduling import EXECUTION_QUEUE_INTERACTIVE, EXECUTION_QUEUE_GRADED, EXECUTION_QUEUE_BATCH, EXECUTION_PRIORITY_STEPS, UserInFlightLimitError, get_execution_scheduler, get_execution_user_key, submit_execution_task
+from app.grading.submission import grade_lecture_submission, record_lecture_submission
+from app.task_completion import TaskCompletionPublisher, wait_for_task_completion, get_task_completions
+from app.single_flight import compute_single_flight_key, get_single_flight
+from app.grading.compiled_test_cases import preload_compiled_test_cases
+from app.grading.test_case_stats import get_adaptive_test_case_order
+from app.performance.complexity import estimate_time_complexity, estimate_lecture_question_time_complexity
+from app.grading.progress import LectureSubmissionProgressPublisher, stream_lecture_submission_events
+from app.grading.preflight import preflight_check, preflight_check_lecture_question
 
 
 app = FastAPI(
@@ -60,6 +76,16 @@ celery_app = Celery(
     backend = f"{os.environ['REDIS_BACKEND_URL']}",
     broker = f"{os.environ['REDIS_BACKEND_URL']}/0",
 )
+# Workers consume the execution queues in order of precedence (start them
+# with `-Q` listing `EXECUTION_QUEUES`, see the Procfile), and only prefetch
+# one task, so priorities apply to everything still queued
+celery_app.conf.update(
+    broker_transport_options = {
+        'queue_order_strategy': 'priority',
+        'priority_steps': list(range(EXECUTION_PRIORITY_STEPS)),
+    },
+    worker_prefetch_multiplier = 1,
+)
 
 # Add middleware
 app.add_middleware(
@@ -276,104 +302,231 @@ def update_user_question(
 
 
 ## Celery Tasks ##
-@celery_app.task
-def execute_code_in_container(language: str, code: str):
+@worker_process_init.connect
+def preload_worker_grading_data(**kwargs):
     """
-    Task to run user-submitted code inside a Docker container.
+    Compile every lecture question's test cases when a worker process starts.
     """
-    # Set up language-specific Docker image
-    docker_image = {
-        "python": "python:3.12-slim",
-    }.get(language)
+    db = SessionLocal()
+    try:
+        number_of_compiled_questions = preload_compiled_test_cases(db=db)
+        print(f"Compiled the test cases of {number_of_compiled_questions} lecture questions")
+    finally:
+        db.close()
 
-    if not docker_image:
-        raise ValueError("Unsupported language")
 
-    language_file_extension = {
-        "python": ".py",
-    }
-    current_file_extension = language_file_extension.get(language)
-    if not current_file_extension:
-        raise ValueError("Unsupported language")
-
-    # Write the user's code to a temporary file
-    host_code_dir = "/tmp"  # Directory on the host
-    # code_file_name = "submission_code.py"  # Name of the file
-    code_file_name = f"submission_code{current_file_extension}"
-    host_code_file = os.path.join(host_code_dir, code_file_name)
+@worker_process_init.connect
+def start_worker_sandbox_reaper(**kwargs):
+    """
+    Clean up sandbox containers left behind by crashed or hung executions.
+    """
+    if settings.sandbox_reaper_enabled and settings.code_executor_backend == "docker":
+        start_sandbox_reaper()
 
-    with open(host_code_file, "w") as f:
-        f.write(code)
 
-    # The code will be placed in the /app directory inside the container
-    container_code_file = f"/app/{code_file_name}"
+@celery_app.task(bind=True)
+def execute_code_in_container(self, language: str, code: str, stream_output: bool = False, scheduling_user_key: Optional[str] = None, scheduling_queue_name: str = EXECUTION_QUEUE_INTERACTIVE, submitted_at: Optional[float] = None, single_flight_key: Optional[str] = None):
+    """
+    Task to run user-submitted code inside a Docker container.
 
+    With `stream_output`, stdout/stderr are published to Redis while the
+    program runs (see `/ws_execution_output/{task_id}`). Its completion is
+    published to Redis either way (see `/result/{task_id}`).
+    """
     MAX_EXECUTION_TIME_IN_SECONDS = 25
 
-    # Initialize Docker client
-    client = docker.from_env()
-
-    # Command to run inside the container
-    exec_cmd = {
-        "python": f"python {container_code_file}",
-    }.get(language)
+    output_publisher = None
+    if stream_output:
+        output_publisher = ExecutionOutputPublisher(task_id=self.request.id)
 
-    result = None
+    completion_publisher = TaskCompletionPublisher(task_id=self.request.id)
     try:
-        container = client.containers.run(
-            image = docker_image,
-            command = exec_cmd,
-            volumes = {host_code_dir: {"bind": "/app", "mode": "rw"}}, # Mount directory
-            working_dir = "/app",
-            detach = True,
-            user = "nobody",
-            read_only = True,
-            network_mode = "none",
-            mem_limit = "256m",
-            cpu_period = 100000,
-            cpu_quota = 50000,
-            pids_limit = 64,
-            security_opt = ["no-new-privileges"]
-        )
-        result = container.wait(
-            timeout = MAX_EXECUTION_TIME_IN_SECONDS
-        )
-        logs = container.logs().decode("utf-8")
-    except docker.errors.ContainerError as e:
-        logs = f"Error: {str(e)}"
-    except docker.errors.APIError as e:
-        logs = f"Docker API Error: {str(e)}"
-    except docker.errors.DockerException as e:
-        logs = f"Docker Execution Error: {str(e)}"
+        with get_execution_scheduler().running(scheduling_user_key, scheduling_queue_name):
+            execution_result = code_execution_utils.execute_code_in_container(
+                language = language,
+                code = code,
+                timeout = MAX_EXECUTION_TIME_IN_SECONDS,
+                output_callback = output_publisher.publish_output if output_publisher is not None else None
+            )
+        if submitted_at is not None:
+            record_execution_latency(scheduling_queue_name, time.time() - submitted_at)
+        if output_publisher is not None:
+            output_publisher.publish_exit(execution_result)
+        completion_publisher.publish_complete(execution_result)
     except Exception as e:
-        logs = f"Unexpected Error: {str(e)}"
+        completion_publisher.publish_error(str(e))
+        raise
     finally:
-        # Clean up the container
-        container.remove(force=True)
+        # Identical runs from now on start a new execution
+        if single_flight_key is not None:
+            get_single_flight().leave(single_flight_key, self.request.id)
+    return execution_result
 
-    if result is not None:
-        if result["StatusCode"] == 0:
-            return {"success": True, "output": logs}
-        else:
-            return {"success": False, "output": logs}
+
+@celery_app.task(bind=True)
+def grade_lecture_submission_task(self, user_code: str, user_created_lecture_question_id: str, custom_user_id: str, fail_fast: bool = False, analyze_complexity: bool = False, profile: bool = False, trace_memory: bool = False, scheduling_user_key: Optional[str] = None, scheduling_queue_name: str = EXECUTION_QUEUE_GRADED, submitted_at: Optional[float] = None, single_flight_key: Optional[str] = None, idempotent: bool = False):
+    """
+    Task to grade a lecture question submission, publishing its progress to
+    Redis (see `/ws_lecture_submission/{submission_id}`).
+    """
+    progress_publisher = LectureSubmissionProgressPublisher(submission_id=self.request.id)
+    completion_publisher = TaskCompletionPublisher(task_id=self.request.id)
+    try:
+        with get_execution_scheduler().running(scheduling_user_key, scheduling_queue_name):
+            db = SessionLocal()
+            try:
+                user_created_lecture_question_object = db.query(UserCreatedLectureQuestion).filter(
+                    UserCreatedLectureQuestion.id == user_created_lecture_question_id
+                ).first()
+                parent_lecture_question_object = db.query(LectureQuestion).filter(
+                    LectureQuestion.id == user_created_lecture_question_object.lecture_question_object_id
+                ).first()
+
+                test_case_order = None
+                if fail_fast:
+                    test_case_order = get_adaptive_test_case_order(
+                        db = db,
+                        lecture_question = parent_lecture_question_object
+                    )
+
+                grading_result = grade_lecture_submission(
+                    user_code = user_code,
+                    lecture_question = parent_lecture_question_object,
+                    op_ai_wrapper = get_openai_wrapper(),
+                    progress_callback = progress_publisher.publish,
+                    fail_fast = fail_fast,
+                    test_case_order = test_case_order,
+                    analyze_complexity = analyze_complexity,
+                    profile = profile,
+                    trace_memory = trace_memory
+                )
+                submission_data = record_lecture_submission(
+                    db = db,
+                    user_code = user_code,
+                    grading_result = grading_result,
+                    user_created_lecture_question_object = user_created_lecture_question_object,
+                    parent_lecture_question_object = parent_lecture_question_object,
+                    custom_user_id = custom_user_id
+                )
+            finally:
+                db.close()
+    except Exception as e:
+        progress_publisher.publish_error(str(e))
+        completion_publisher.publish_error(str(e))
+        if single_flight_key is not None:
+            get_single_flight().leave(single_flight_key, self.request.id)
+        raise
+
+    if submitted_at is not None:
+        record_execution_latency(scheduling_queue_name, time.time() - submitted_at)
+    progress_publisher.publish_complete(submission_data)
+    if single_flight_key is not None:
+        _complete_single_flight(single_flight_key, self.request.id, submission_data, idempotent=idempotent)
     else:
-        return {"success": False, "output": logs}
+        completion_publisher.publish_complete(submission_data)
+    return submission_data
+
+
+def _raise_in_flight_limit_error(e: UserInFlightLimitError):
+    raise HTTPException(
+        status_code = 429,
+        detail = str(e),
+        headers = {"Retry-After": str(e.retry_after_seconds)}
+    )
+
+
+def _raise_execution_capacity_error(e: ExecutionCapacityError):
+    raise HTTPException(
+        status_code = 503,
+        detail = str(e),
+        headers = {"Retry-After": str(e.retry_after_seconds)}
+    )
 
 
 @app.post("/execute_user_code")
 async def execute_code(
-    request: CodeExecutionRequestSchema
+    request: CodeExecutionRequestSchema,
+    http_request: Request,
+    token: Optional[str] = Depends(get_optional_token)
 ):
     """
     Endpoint to submit code for execution.
+
+    Runs go to the interactive queue, prioritized by how much execution time
+    the user used recently; a user with too many runs in flight gets a 429
+    with a `Retry-After` header. Running the same code again while it still
+    runs returns the same task.
+
+    When the execution queues are over capacity (see `/execution_capacity`),
+    runs are refused with a 503 and a `Retry-After` header, or with
+    `defer_if_busy`, queued behind everything else on the batch queue.
     """
     user_language = request.language
     user_code = request.code
-    task = execute_code_in_container.delay(
-        language = user_language,
-        code = user_code
+    user_key = get_execution_user_key(
+        user_id = request.user_id,
+        token = token,
+        client_host = http_request.client.host if http_request.client is not None else None
     )
-    return {"task_id": task.id}
+
+    # The same code run again while it's still running gets the running
+    # execution's task id
+    single_flight = get_single_flight()
+    single_flight_key = None
+    task_id = None
+    if settings.single_flight_enabled:
+        single_flight_key = compute_single_flight_key("execute_user_code", user_key, user_language, user_code, request.stream_output)
+        task_id, is_leader = single_flight.join(single_flight_key)
+        if not is_leader:
+            return {"task_id": task_id}
+
+    queue_name = EXECUTION_QUEUE_INTERACTIVE
+    try:
+        try:
+            admit_interactive_execution()
+        except ExecutionCapacityError:
+            if not (request.defer_if_busy and settings.execution_priority_queues_enabled):
+                raise
+            queue_name = EXECUTION_QUEUE_BATCH
+        task = submit_execution_task(
+            task = execute_code_in_container,
+            queue_name = queue_name,
+            user_key = user_key,
+            task_kwargs = {
+                'language': user_language,
+                'code': user_code,
+                'stream_output': request.stream_output,
+                'single_flight_key': single_flight_key
+            },
+            task_id = task_id
+        )
+    except Exception as e:
+        if single_flight_key is not None:
+            single_flight.leave(single_flight_key, task_id)
+        if isinstance(e, UserInFlightLimitError):
+            _raise_in_flight_limit_error(e)
+        if isinstance(e, ExecutionCapacityError):
+            _raise_execution_capacity_error(e)
+        raise
+    return {"task_id": task.id, "deferred": queue_name == EXECUTION_QUEUE_BATCH}
+
+
+@app.websocket("/ws_execution_output/{task_id}")
+async def websocket_execution_output(
+    websocket: WebSocket,
+    task_id: str
+):
+    """
+    Stream the stdout/stderr of an execution started with `stream_output`,
+    followed by a final `exit` event.
+    """
+    await websocket.accept()
+    try:
+        async for event in stream_execution_output(task_id):
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
   
 
 @app.get("/task/status/{task_id}")
@@ -384,21 +537,78 @@ async def get_status(
     return {"task_id": task_id, "status": task_result.status}
 
 
+@app.post("/task/status")
+def get_statuses(
+    data: TaskStatusBatchSchema
+):
+    """
+    The status of many tasks in one call; finished tasks come with their
+    result (or error).
+    """
+    if len(data.task_ids) > settings.task_status_batch_max_size:
+        raise HTTPException(status_code=400, detail=f"At most {settings.task_status_batch_max_size} task ids can be checked at once.")
+
+    task_statuses = []
+    for task_id, completion_event in get_task_completions(data.task_ids).items():
+        if completion_event is None:
+            task_statuses.append({"task_id": task_id, "status": AsyncResult(task_id).status})
+        elif completion_event['type'] == 'complete':
+            task_statuses.append({"task_id": task_id, "status": "SUCCESS", "result": completion_event['result']})
+        else:
+            task_statuses.append({"task_id": task_id, "status": "FAILURE", "error": completion_event['error']})
+    return {
+        'success': True,
+        'data': task_statuses
+    }
+
+
+def _get_finished_task_completion(task_id: str) -> Optional[dict]:
+    """
+    The completion of a task from the result backend (which outlives the
+    completion event), or None while it hasn't finished.
+    """
+    task_result = celery_app.AsyncResult(task_id)
+    if not task_result.ready():
+        return None
+    if task_result.successful():
+        return {'type': 'complete', 'result': task_result.result}
+    return {'type': 'error', 'error': str(task_result.result)}
+
+
 @app.get("/result/{task_id}")
-def get_result(
-    task_id: str
+async def get_result(
+    task_id: str,
+    wait_seconds: Optional[float] = None
 ):
     """
     Endpoint to check the result of the execution.
+
+    Long-polls without holding a thread: the response is sent as soon as
+    the execution completes, or after `wait_seconds` (at most the
+    `task_result_max_wait_seconds` setting) with a 202 and the task's
+    status, to poll again.
     """
-    task_result = celery_app.AsyncResult(task_id)
-    result_data = task_result.get()
+    if wait_seconds is None or wait_seconds > settings.task_result_max_wait_seconds:
+        wait_seconds = settings.task_result_max_wait_seconds
+
+    completion_event = _get_finished_task_completion(task_id)
+    if completion_event is None:
+        completion_event = await wait_for_task_completion(task_id, timeout=wait_seconds)
+    if completion_event is None:
+        return JSONResponse(
+            status_code = 202,
+            content = {"task_id": task_id, "status": AsyncResult(task_id).status}
+        )
+    if completion_event['type'] == 'error':
+        raise HTTPException(status_code=500, detail=completion_event['error'])
 
+    result_data = completion_event['result']
     result_output_status = result_data['success']
     result_output_value = result_data['output']
     return {
         "result_output_status": result_output_status,
-        "result_output_value": result_output_value
+        "result_output_value": result_output_value,
+        "result_output_truncated": result_data.get('output_truncated', False)
     }
 
 
@@ -1206,158 +1416,300 @@ def handle_lecture_question_submission(
     ).first()
 
     user_code = data.code
+    scheduling_user_key = get_execution_user_key(user_id=str(authenticated_user_object.id))
+
+    # Identical submissions in flight (and retries with the same idempotency
+    # key) get the response of the first one instead of being graded again
+    single_flight = get_single_flight()
+    single_flight_key = None
+    flight_id = None
+    if data.idempotency_key is not None:
+        single_flight_key = compute_single_flight_key("idempotency", authenticated_user_object.id, data.async_grading, data.idempotency_key)
+    elif settings.single_flight_enabled:
+        single_flight_key = compute_single_flight_key(
+            "handle_lecture_question_submission", authenticated_user_object.id, user_created_question_id, user_code,
+            data.async_grading, data.fail_fast, data.analyze_complexity, data.profile, data.trace_memory
+        )
+    if single_flight_key is not None:
+        flight_id, is_leader = single_flight.join(
+            single_flight_key,
+            ttl_seconds = settings.idempotency_key_ttl_seconds if data.idempotency_key is not None else None
+        )
+        if not is_leader:
+            if data.async_grading:
+                return {
+                    'success': True,
+                    'data': {
+                        'submission_id': flight_id
+                    }
+                }
+            return _wait_for_lecture_submission_flight(flight_id)
+
+    if data.async_grading:
+        try:
+            task = submit_execution_task(
+                task = grade_lecture_submission_task,
+                queue_name = EXECUTION_QUEUE_GRADED,
+                user_key = scheduling_user_key,
+                task_kwargs = {
+                    'user_code': user_code,
+                    'user_created_lecture_question_id': user_created_lecture_question_object.id,
+                    'custom_user_id': authenticated_user_object.id,
+                    'fail_fast': data.fail_fast,
+                    'analyze_complexity': data.analyze_complexity,
+                    'profile': data.profile,
+                    'trace_memory': data.trace_memory,
+                    'single_flight_key': single_flight_key,
+                    'idempotent': data.idempotency_key is not None
+                },
+                task_id = flight_id
+            )
+        except Exception as e:
+            if single_flight_key is not None:
+                single_flight.leave(single_flight_key, flight_id)
+            if isinstance(e, UserInFlightLimitError):
+                _raise_in_flight_limit_error(e)
+            raise
+        return {
+            'success': True,
+            'data': {
+                'submission_id': task.id
+            }
+        }
 
-    # lecture_question_object.test_case_list
-    question_literal_tc_list = ast.literal_eval(parent_lecture_question_object.test_case_list)
-    tc_return_list = []
-    for tc_di in question_literal_tc_list:
-        input_tc_dict = tc_di['input']
-        tc_return_list.append({
-            'input': input_tc_dict,
-            "expected_output": tc_di["expected_output"]
-        })
-
-    tc_function_name = parent_lecture_question_object.test_function_name
+    try:
+        test_case_order = None
+        if data.fail_fast:
+            test_case_order = get_adaptive_test_case_order(
+                db = db,
+                lecture_question = parent_lecture_question_object
+            )
 
-    tc_results = None
-    if tc_function_name == 'run_test_cases_without_function':
-        tc_results = run_test_cases_without_function(
+        execution_scheduler = get_execution_scheduler()
+        try:
+            execution_scheduler.acquire(scheduling_user_key, EXECUTION_QUEUE_GRADED)
+        except UserInFlightLimitError as e:
+            _raise_in_flight_limit_error(e)
+        with execution_scheduler.running(scheduling_user_key, EXECUTION_QUEUE_GRADED):
+            grading_result = grade_lecture_submission(
+                user_code = user_code,
+                lecture_question = parent_lecture_question_object,
+                op_ai_wrapper = op_ai_wrapper,
+                fail_fast = data.fail_fast,
+                test_case_order = test_case_order,
+                analyze_complexity = data.analyze_complexity,
+                profile = data.profile,
+                trace_memory = data.trace_memory
+            )
+        submission_data = record_lecture_submission(
+            db = db,
             user_code = user_code,
-            test_case_list = ast.literal_eval(parent_lecture_question_object.test_case_list)
+            grading_result = grading_result,
+            user_created_lecture_question_object = user_created_lecture_question_object,
+            parent_lecture_question_object = parent_lecture_question_object,
+            custom_user_id = authenticated_user_object.id
         )
+    except Exception as e:
+        if single_flight_key is not None:
+            TaskCompletionPublisher(task_id=flight_id).publish_error(str(getattr(e, 'detail', e)))
+            single_flight.leave(single_flight_key, flight_id)
+        raise
 
-    elif tc_function_name == 'run_test_cases_with_function':
-        tc_results = run_test_cases_with_function(
-            user_code = user_code,
-            function_name = parent_lecture_question_object.function_name,
-            test_case_list = ast.literal_eval(parent_lecture_question_object.test_case_list)
-        )
-    
-    elif tc_function_name == 'run_test_cases_with_class':
-        # TODO: 
-        run_test_cases_with_class(
-            user_code = user_code,
-            class_name = parent_lecture_question_object.class_name,
-            test_case_list = ast.literal_eval(parent_lecture_question_object.test_case_list)
+    response_data = {
+        'success': True,
+        'data': submission_data
+    }
+    if single_flight_key is not None:
+        _complete_single_flight(single_flight_key, flight_id, response_data, idempotent=data.idempotency_key is not None)
+    return response_data
+
+
+def _complete_single_flight(single_flight_key: str, flight_id: str, result, idempotent: bool):
+    """
+    Hand the result to the requests attached to the flight. Idempotency keys
+    (and the result) are kept until they expire, so retries get it too.
+    """
+    if idempotent:
+        TaskCompletionPublisher(task_id=flight_id, log_ttl_seconds=settings.idempotency_key_ttl_seconds).publish_complete(result)
+    else:
+        TaskCompletionPublisher(task_id=flight_id).publish_complete(result)
+        get_single_flight().leave(single_flight_key, flight_id)
+
+
+def _wait_for_lecture_submission_flight(flight_id: str) -> dict:
+    """
+    The response of the identical submission being graded synchronously by
+    another request.
+    """
+    completion_event = asyncio.run(wait_for_task_completion(flight_id, timeout=settings.single_flight_wait_seconds))
+    if completion_event is None:
+        raise HTTPException(
+            status_code = 409,
+            detail = "An identical submission is still being graded.",
+            headers = {"Retry-After": str(settings.single_flight_wait_seconds)}
         )
+    if completion_event['type'] == 'error':
+        raise HTTPException(status_code=500, detail=completion_event['error'])
+    return completion_event['result']
 
-    all_tests_passed = True
-    for rslt in tc_results:
-        if rslt['correct'] != 'yes':
-            all_tests_passed = False
-            break
-
-    serialized_test_case_results = json.dumps(tc_results, indent=2)
-    solution_fb_prompt = _prepare_solution_feedback_prompt(
-        user_code = user_code,
-        correct_solution = parent_lecture_question_object.correct_solution,
-        test_case_result_boolean = all_tests_passed,
-        test_case_result_list_str = serialized_test_case_results
-    )
 
-    tc_results_output_list = []
-    for eval_dict in tc_results:
-        if 'program_output' in eval_dict:
-            program_output = str(eval_dict['program_output'])
-            expected_output = str(eval_dict['expected_output'])
-            eval_dict['program_output'] = program_output
-            eval_dict['expected_output'] = expected_output
-            tc_results_output_list.append(eval_dict)
-        else:
-            tc_results_output_list.append(eval_dict)
+@app.websocket("/ws_lecture_submission/{submission_id}")
+async def websocket_lecture_submission(
+    websocket: WebSocket,
+    submission_id: str
+):
+    """
+    Stream the grading progress of a submission made with `async_grading`:
+    one event per finished test case, `test_cases_complete`, `feedback_ready`
+    and a final `complete` event (with the same data as the synchronous
+    response) or `error` event.
+    """
+    await websocket.accept()
+    try:
+        async for event in stream_lecture_submission_events(submission_id):
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
 
-    ai_response = op_ai_wrapper.generate_sync_response(
-        prompt = solution_fb_prompt,
-        return_in_json = False
-    )
-    ai_response_string = ai_response.choices[0].message.content
-
-    lc_submission_history_object = LectureCodeSubmissionHistory(
-        code = user_code,
-        test_case_boolean_result = all_tests_passed,
-        program_output_list = str(tc_results),
-        ai_feedback_response_string = ai_response_string,
-        user_created_lecture_question_object_id = user_created_lecture_question_object.id
-    )
-    db.add(lc_submission_history_object)
-    db.commit()
-    db.refresh(lc_submission_history_object)
-    
-    # if true --> update
-    if all_tests_passed:
 
-        user_created_lecture_question_object.complete = True
-        db.add(user_created_lecture_question_object)
-        db.commit()
-        db.refresh(user_created_lecture_question_object)
+@app.post("/analyze_time_complexity")
+def analyze_time_complexity(
+    data: TimeComplexityAnalysisSchema,
+    db: Session = Depends(get_db)
+):
+    """
+    Estimate the big-O of a function in the user's code from timings on
+    growing inputs.
 
-        parent_lm_object = db.query(LectureMain).filter(
-            LectureMain.id == parent_lecture_question_object.lecture_main_object_id
+    For a lecture question, the function, inputs and reference solution come
+    from the question. In the playground, the function name and a sample input
+    (or an input generator) are given, and an initial playground question's
+    solution is used as the reference when its id is given.
+    """
+    if data.lecture_question_id is not None:
+        lecture_question_object = db.query(LectureQuestion).filter(
+            LectureQuestion.id == data.lecture_question_id
         ).first()
-        # fetch all lm objects with lec-number
-        all_current_lm_objects = db.query(LectureMain).filter(
-            LectureMain.number == parent_lm_object.number
-        ).all()
+        if lecture_question_object is None:
+            raise HTTPException(status_code=404, detail="Lecture question not found.")
 
-        # fetch lecture questions for lm object
-        total_questions_passed = 0
-        # total_questions_count = len(all_current_lm_objects)
-        total_questions_count = db.query(LectureQuestion).filter(
-            LectureQuestion.lecture_main_object_id == parent_lm_object.id
-        ).count()
-        for current_lm_obj in all_current_lm_objects:
-            all_current_lq_objects = db.query(LectureQuestion).filter(
-                LectureQuestion.lecture_main_object_id == current_lm_obj.id
-            ).all()
-            for crt_lecture_q_obj in all_current_lq_objects:
-                # filter for current user and lecture_question
-                user_completed_lecture_q_object = db.query(UserCreatedLectureQuestion).filter(
-                    UserCreatedLectureQuestion.lecture_question_object_id == crt_lecture_q_obj.id,
-                    UserCreatedLectureQuestion.custom_user_id == authenticated_user_object.id,
-                    UserCreatedLectureQuestion.complete == True
-                ).first()
-                if user_completed_lecture_q_object is not None:
-                    total_questions_passed += 1
-
-        current_lecture_completed = False
-        print(f"Total Questions Passed: {total_questions_passed} || Total Questions Count: {total_questions_count}")
-        if (total_questions_passed >= total_questions_count):
-            current_lecture_completed = True
-
-        # filter for current user and lecture object
-        existing_user_lecture_main_obj = db.query(UserLectureMain).filter(
-            UserLectureMain.lecture_main_object_id == parent_lecture_question_object.lecture_main_object_id,
-            UserLectureMain.custom_user_id == authenticated_user_object.id
+        complexity_analysis = estimate_lecture_question_time_complexity(
+            user_code = data.code,
+            lecture_question = lecture_question_object
+        )
+        if complexity_analysis is None:
+            raise HTTPException(status_code=400, detail="Time complexity can only be estimated for function questions.")
+        return {
+            'success': True,
+            'data': complexity_analysis
+        }
+
+    if data.function_name is None:
+        raise HTTPException(status_code=400, detail="function_name is required.")
+
+    reference_code = None
+    expected_big_o = None
+    if data.initial_playground_question_id is not None:
+        initial_pg_question_object = db.query(InitialPlaygroundQuestion).filter(
+            InitialPlaygroundQuestion.id == data.initial_playground_question_id
+        ).first()
+        if initial_pg_question_object is None:
+            raise HTTPException(status_code=404, detail="Playground question not found.")
+        reference_code = initial_pg_question_object.solution_code
+        expected_big_o = initial_pg_question_object.solution_time_complexity
+
+    complexity_analysis = estimate_time_complexity(
+        user_code = data.code,
+        function_name = data.function_name,
+        reference_code = reference_code,
+        sample_input = data.sample_input,
+        input_generator = data.input_generator
+    )
+    complexity_analysis['expected_big_o'] = expected_big_o
+    return {
+        'success': True,
+        'data': complexity_analysis
+    }
+
+
+@app.post("/preflight_check")
+def run_preflight_check(
+    data: PreflightCheckSchema,
+    db: Session = Depends(get_db)
+):
+    """
+    Statically check the user's code (syntax, the required function or class,
+    imports) without running it; cheap enough to call as the user types.
+
+    For a lecture question, the required function or class comes from the
+    question; otherwise from `function_name` / `class_name`.
+    """
+    if data.lecture_question_id is not None:
+        lecture_question_object = db.query(LectureQuestion).filter(
+            LectureQuestion.id == data.lecture_question_id
         ).first()
+        if lecture_question_object is None:
+            raise HTTPException(status_code=404, detail="Lecture question not found.")
+
+        preflight_result = preflight_check_lecture_question(
+            user_code = data.code,
+            lecture_question = lecture_question_object
+        )
+    else:
+        preflight_result = preflight_check(
+            user_code = data.code,
+            function_name = data.function_name,
+            class_name = data.class_name
+        )
+    return {
+        'success': True,
+        'data': preflight_result
+    }
 
-        if existing_user_lecture_main_obj is not None:
-            existing_user_lecture_main_obj.complete = current_lecture_completed
-            db.add(existing_user_lecture_main_obj)
-            db.commit()
-            db.refresh(existing_user_lecture_main_obj)
-        else:
-            user_lec_main_object = UserLectureMain(
-                complete = current_lecture_completed,
-                custom_user_id = authenticated_user_object.id,
-                lecture_main_object_id = parent_lecture_question_object.lecture_main_object_id,
-            )
-            db.add(user_lec_main_object)
-            db.commit()
-            db.refresh(user_lec_main_object)
 
+@app.get("/grading_cache/stats")
+def get_grading_cache_stats():
+    grading_cache = get_grading_cache()
     return {
         'success': True,
-        'data': {
-            'lc_submission_history_object_id': lc_submission_history_object.id,
-            'lc_submission_history_object_created': lc_submission_history_object.created_at,
-            'lc_submission_history_object_boolean_result': lc_submission_history_object.test_case_boolean_result,
-            'lc_submission_history_code': lc_submission_history_object.code,
-
-            # 'result_list': tc_results,
-            'result_list': tc_results_output_list,
-            'all_tests_passed': all_tests_passed,
-            'ai_response': ai_response_string
-        }
+        'data': grading_cache.stats()
+    }
+
+
+@app.get("/sandbox_reaper/stats")
+def get_sandbox_reaper_stats():
+    """
+    The latest report (containers checked and removed) of every worker's
+    sandbox reaper.
+    """
+    return {
+        'success': True,
+        'data': get_reaper_reports()
+    }
+
+
+@app.get("/execution_queues/stats")
+def get_execution_queue_stats():
+    """
+    Per execution queue: the tasks waiting, the per-user in-flight limit and
+    the users active in the fair share window.
+    """
+    return {
+        'success': True,
+        'data': get_execution_scheduler().stats()
+    }
+
+
+@app.get("/execution_capacity")
+def get_execution_capacity():
+    """
+    Whether new interactive runs are accepted right now, with the queue
+    depths and recent latencies that decide it.
+    """
+    return {
+        'success': True,
+        'data': get_capacity_state()
     }
 
 
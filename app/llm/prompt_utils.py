@@ -82,7 +82,24 @@ Question: {user_current_problem_text}
     return prompt
 
 
-def _prepare_solution_feedback_prompt(user_code, correct_solution, test_case_result_boolean, test_case_result_list_str):
+def _prepare_solution_feedback_prompt(user_code, correct_solution, test_case_result_boolean, test_case_result_list_str, test_case_metrics_list_str=None, performance_result_str=None, profile_summary_str=None, memory_trace_summary_str=None):
+    performance_section = ""
+    if performance_result_str is not None:
+        performance_section = f"""
+The speed of the student's code compared with the reference solution, on the same large input (status is "correct_but_too_slow" when it is more than slowdown_threshold times slower):
+{performance_result_str}
+"""
+    if profile_summary_str is not None:
+        performance_section += f"""
+A profile of the student's code over the test cases:
+{profile_summary_str}
+"""
+    if memory_trace_summary_str is not None:
+        performance_section += f"""
+A memory trace of the student's code over the test cases (peak traced memory, and the lines holding the most memory at that peak):
+{memory_trace_summary_str}
+"""
+
     prompt = f"""You are a programming tutor providing feedback on a student's code.
 
 The student's solution is as follows:
@@ -97,6 +114,9 @@ Did all the test cases pass (boolean):
 The test cases results list for the student's code are:
 {test_case_result_list_str}
 
+The wall time (ms), CPU time (ms) and peak memory (kb) the student's code used for each test case, in the same order (null when it was not measured):
+{test_case_metrics_list_str}
+{performance_section}
 1. **Test Case Results Summary**: 
    - If the student's solution passes all test cases, provide a positive summary about the correctness of the solution.
    - If the solution fails any test cases, highlight which test case(s) failed and provide suggestions for debugging or fixing the code.
@@ -104,6 +124,10 @@ The test cases results list for the student's code are:
 2. **General Code Feedback**:
    - Check if the student’s solution follows best coding practices.
    - Identify any areas where the solution can be improved, such as code readability, efficiency, or potential edge cases that were not considered.
+   - If a test case took unusually long or used unusually much memory, point it out and explain what in the code likely causes it.
+   - If the solution is correct but too slow, say so clearly and hint at a more efficient approach, without giving away the reference solution.
+   - If a profile is provided, base any performance advice on the hottest functions and lines it shows.
+   - If a memory trace is provided, base any memory advice on the lines it shows, and if the code ran out of memory, say so clearly.
    - Compare the student’s solution with the correct one and suggest how the code could be refactored to align more closely with the correct solution.
 
 3. **Specific Recommendations**:
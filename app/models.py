@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Boolean, func
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Boolean, Float, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -165,6 +165,14 @@ class LectureQuestion(QuestionBaseModel):
     function_name = Column(String, nullable=True)
     class_name = Column(String, nullable=True)
     test_function_name = Column(String, nullable=True)
+    executor_backend = Column(String, nullable=True)  # overrides the code_executor_backend setting
+    performance_input_generator = Column(String, nullable=True)  # source of generate_input(n), for performance analysis
+    performance_slowdown_threshold = Column(Float, nullable=True)  # max slowdown vs correct_solution; performance grading is off when null
+    performance_input_size = Column(Integer, nullable=True)  # input size for performance grading
+    execution_timeout_seconds = Column(Integer, nullable=True)  # per test case; overrides the harness_per_case_timeout setting
+    execution_memory_limit_mb = Column(Integer, nullable=True)  # overrides the sandbox_memory_limit_mb setting
+    execution_cpu_quota = Column(Float, nullable=True)  # in CPUs; overrides the sandbox_cpu_quota setting
+    execution_output_max_bytes = Column(Integer, nullable=True)  # per test case; overrides the harness_output_max_bytes_per_program setting
 
     question_type = Column(String, nullable=True)  # TODO: question_type (lecture_exercise or problem_set)
     problem_set_part = Column(String, nullable=True)
@@ -218,6 +226,7 @@ class LectureCodeSubmissionHistory(Base):
     code = Column(String, nullable=False)
     test_case_boolean_result = Column(Boolean, default=False)
     program_output_list = Column(String, nullable=False)
+    test_case_metrics_list = Column(String, nullable=True)  # JSON list of per test case execution metrics
     ai_feedback_response_string = Column(String, nullable=False)
     user_created_lecture_question_object_id = Column(UUID, ForeignKey('user_created_lecture_question.id'), nullable=False)
     user_created_lecture_question_object =relationship("UserCreatedLectureQuestion")
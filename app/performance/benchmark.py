@@ -0,0 +1,96 @@
+import os
+import ast
+from typing import Optional
+
+from app.code_execution_utils import execute_code_in_container, HARNESS_STARTUP_ALLOWANCE_IN_SECONDS
+from app.execution.harness import build_harness_program, parse_harness_output, get_harness_max_output_bytes
+
+
+BENCHMARK_RUNTIME_PATH = os.path.join(os.path.dirname(__file__), "benchmark_runtime.py")
+
+with open(BENCHMARK_RUNTIME_PATH, "r") as f:
+    BENCHMARK_RUNTIME_SOURCE = f.read()
+
+
+def build_benchmark_program(code: str, function_name: str, input_sizes: list, time_limit_per_size: float, sample_input: Optional[dict] = None, input_generator: Optional[str] = None) -> dict:
+    """
+    Build a harness program that times `function_name` from `code` on inputs
+    of each of the `input_sizes`.
+
+    Inputs come from `input_generator` (the source of a
+    `generate_input(n) -> dict of keyword arguments` function) when given,
+    otherwise from scaling up `sample_input` (see `_companion_scale_input`).
+    """
+    if input_generator is not None:
+        input_generator_expression = f"_companion_load_input_generator({input_generator!r})"
+    else:
+        input_generator_expression = f"_companion_scaled_input_generator({sample_input or {}!r})"
+
+    return {
+        "code": code + "\n\n" + BENCHMARK_RUNTIME_SOURCE,
+        "result_expression": f"_companion_benchmark({function_name}, {input_generator_expression}, {list(input_sizes)!r}, {time_limit_per_size!r})",
+    }
+
+
+def run_analysis_programs(analysis_programs: list, per_program_timeout: int, backend: Optional[str] = None) -> list:
+    """
+    Run harness programs whose result expression returns a dict (benchmarks,
+    profiles, ...) within one sandbox execution, one after the other (so they
+    don't compete for CPU). Returns that dict for every program, or
+    `{"error": str, "out_of_memory": bool}` if it failed to run.
+    """
+    harness_program = build_harness_program(
+        programs = analysis_programs,
+        per_case_timeout = per_program_timeout
+    )
+    harness_execution_result = execute_code_in_container(
+        language = 'python',
+        code = harness_program,
+        timeout = per_program_timeout * len(analysis_programs) + HARNESS_STARTUP_ALLOWANCE_IN_SECONDS,
+        backend = backend,
+        max_output_bytes = get_harness_max_output_bytes(len(analysis_programs))
+    )
+    execution_results = parse_harness_output(
+        execution_result = harness_execution_result,
+        number_of_programs = len(analysis_programs)
+    )
+
+    analysis_results = []
+    for execution_result in execution_results:
+        if execution_result["success"] and isinstance(execution_result.get("value"), dict):
+            analysis_results.append(execution_result["value"])
+        else:
+            analysis_results.append({
+                "error": execution_result.get("error") or execution_result["output"][-2000:],
+                "out_of_memory": execution_result.get("out_of_memory", False),
+            })
+    return analysis_results
+
+
+def run_benchmark_programs(benchmark_programs: list, per_program_timeout: int, backend: Optional[str] = None) -> list:
+    """
+    `run_analysis_programs` for benchmark programs: one
+    `{"timings": [[n, seconds], ...], "stopped_reason": Optional[str]}` dict
+    per program (with no timings and an `error` if it failed to run).
+    """
+    return [
+        {"timings": [], **benchmark_result}
+        for benchmark_result in run_analysis_programs(benchmark_programs, per_program_timeout, backend)
+    ]
+
+
+def get_lecture_question_sample_input(lecture_question) -> Optional[dict]:
+    """
+    The keyword arguments of the question's first test case that only has
+    literal inputs (inputs given as source code, like lambdas, can't be
+    scaled up).
+    """
+    for tc_dict in ast.literal_eval(lecture_question.test_case_list):
+        try:
+            return {
+                k: ast.literal_eval(v) if isinstance(v, str) and (v.startswith("(") or v.startswith("[")) else v
+                for k, v in tc_dict['input'].items()
+            }
+        except (ValueError, SyntaxError):
+            continue
+    return None
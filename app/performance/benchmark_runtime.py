@@ -0,0 +1,93 @@
+"""
+Benchmark helpers executed *inside* the sandbox.
+
+This file only depends on the standard library: its source is appended to the
+program under test (see `app/performance/benchmark.py`), which runs through
+the test harness with `_companion_benchmark(...)` as its result expression.
+Names are prefixed so they don't collide with the student's code.
+"""
+import time
+import signal
+
+
+class _CompanionBenchmarkTimeout(Exception):
+    pass
+
+
+def _companion_scale_input(template, n):
+    """
+    Grow a sample input to size `n`: sequences are repeated up to length `n`,
+    integers become `n`, anything else is kept as is.
+    """
+    if isinstance(template, list):
+        return [template[i % len(template)] for i in range(n)] if template else list(range(n))
+    if isinstance(template, tuple):
+        return tuple(_companion_scale_input(list(template), n))
+    if isinstance(template, str):
+        return (template * (n // len(template) + 1))[:n] if template else "a" * n
+    if isinstance(template, int) and not isinstance(template, bool):
+        return n
+    return template
+
+
+def _companion_scaled_input_generator(template_kwargs):
+    return lambda n: {k: _companion_scale_input(v, n) for k, v in template_kwargs.items()}
+
+
+def _companion_load_input_generator(source):
+    """
+    Load a `generate_input(n) -> dict of keyword arguments` function from its
+    source, in its own namespace.
+    """
+    namespace = {"__name__": "_companion_input_generator"}
+    exec(compile(source, "<input generator>", "exec"), namespace)
+    return namespace["generate_input"]
+
+
+def _companion_time_call(function, generate_input, n, repeats, time_limit):
+    def _on_alarm(signum, frame):
+        raise _CompanionBenchmarkTimeout()
+
+    best_elapsed = None
+    previous_handler = signal.signal(signal.SIGALRM, _on_alarm)
+    try:
+        for _ in range(repeats):
+            # Fresh inputs for every call, generated outside the timed section
+            kwargs = generate_input(n)
+            signal.setitimer(signal.ITIMER_REAL, time_limit)
+            try:
+                start = time.perf_counter()
+                function(**kwargs)
+                elapsed = time.perf_counter() - start
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            best_elapsed = elapsed if best_elapsed is None else min(best_elapsed, elapsed)
+            if elapsed > time_limit / repeats:
+                break
+    finally:
+        signal.signal(signal.SIGALRM, previous_handler)
+    return best_elapsed
+
+
+def _companion_benchmark(function, generate_input, input_sizes, time_limit_per_size, repeats=3):
+    """
+    Time `function` on inputs of increasing size (best of `repeats` calls per
+    size), stopping once a call exceeds `time_limit_per_size` or the next size
+    would likely exceed it.
+    """
+    timings = []
+    stopped_reason = None
+    for n in input_sizes:
+        try:
+            elapsed = _companion_time_call(function, generate_input, n, repeats, time_limit_per_size)
+        except _CompanionBenchmarkTimeout:
+            stopped_reason = f"time limit exceeded at input size {n}"
+            break
+        except Exception as e:
+            stopped_reason = f"{type(e).__name__} at input size {n}: {e}"
+            break
+        timings.append([n, elapsed])
+        if elapsed > time_limit_per_size / 4:
+            stopped_reason = f"approaching the time limit at input size {n}"
+            break
+    return {"timings": timings, "stopped_reason": stopped_reason}
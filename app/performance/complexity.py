@@ -0,0 +1,155 @@
+import math
+from typing import Optional
+
+from app.config import settings
+from app.models import LectureQuestion
+from app.performance.benchmark import build_benchmark_program, run_benchmark_programs, get_lecture_question_sample_input
+
+
+# Ordered from slowest to fastest growing, so ties go to the simpler class
+GROWTH_CLASSES = [
+    ("O(1)", lambda n: 1.0),
+    ("O(log n)", lambda n: math.log2(n)),
+    ("O(n)", lambda n: float(n)),
+    ("O(n log n)", lambda n: n * math.log2(n)),
+    ("O(n^2)", lambda n: float(n) ** 2),
+    ("O(n^3)", lambda n: float(n) ** 3),
+]
+
+# Fewer measured sizes than this don't say anything about growth
+MIN_TIMINGS_FOR_FIT = 4
+
+# A simpler growth class wins when its fit is within this factor of the best
+SIMPLER_CLASS_RESIDUAL_TOLERANCE = 1.1
+
+
+def _fit_residual(input_sizes: list, timings: list, growth_function) -> float:
+    """
+    Residual sum of squares of the least squares fit of
+    `time = a + b * growth_function(n)`, with `b >= 0`.
+    """
+    growth_values = [growth_function(n) for n in input_sizes]
+    mean_growth = sum(growth_values) / len(growth_values)
+    mean_time = sum(timings) / len(timings)
+
+    growth_variance = sum((g - mean_growth) ** 2 for g in growth_values)
+    slope = 0.0
+    if growth_variance > 0:
+        slope = max(0.0, sum((g - mean_growth) * (t - mean_time) for g, t in zip(growth_values, timings)) / growth_variance)
+    intercept = mean_time - slope * mean_growth
+
+    return sum((t - (intercept + slope * g)) ** 2 for g, t in zip(growth_values, timings))
+
+
+def fit_growth_class(timings: list) -> Optional[str]:
+    """
+    Pick the growth class (e.g. "O(n log n)") that best explains
+    `[[input size, seconds], ...]`, or None with too few measurements.
+    """
+    if len(timings) < MIN_TIMINGS_FOR_FIT:
+        return None
+
+    input_sizes = [max(n, 2) for n, _ in timings]
+    times = [t for _, t in timings]
+    residuals = [
+        (growth_class, _fit_residual(input_sizes, times, growth_function))
+        for growth_class, growth_function in GROWTH_CLASSES
+    ]
+    best_residual = min(residual for _, residual in residuals)
+    for growth_class, residual in residuals:
+        if residual <= best_residual * SIMPLER_CLASS_RESIDUAL_TOLERANCE:
+            return growth_class
+
+
+def compute_slowdown(student_timings: list, reference_timings: list) -> Optional[dict]:
+    """
+    How many times slower the student's code is than the reference, at the
+    largest input size both were timed on.
+    """
+    reference_time_by_size = {n: t for n, t in reference_timings}
+    common_sizes = [n for n, _ in student_timings if n in reference_time_by_size]
+    if len(common_sizes) == 0:
+        return None
+
+    input_size = max(common_sizes)
+    student_time = dict(student_timings)[input_size]
+    reference_time = reference_time_by_size[input_size]
+    return {
+        'input_size': input_size,
+        'student_time_seconds': student_time,
+        'reference_time_seconds': reference_time,
+        'slowdown_ratio': round(student_time / reference_time, 3) if reference_time > 0 else None,
+    }
+
+
+def _summarize_benchmark(benchmark_result: dict) -> dict:
+    return {
+        'big_o': fit_growth_class(benchmark_result['timings']),
+        'timings': benchmark_result['timings'],
+        'stopped_reason': benchmark_result.get('stopped_reason'),
+        'error': benchmark_result.get('error'),
+    }
+
+
+def estimate_time_complexity(user_code: str, function_name: str, reference_code: Optional[str] = None, sample_input: Optional[dict] = None, input_generator: Optional[str] = None, backend: Optional[str] = None) -> dict:
+    """
+    Estimate the time complexity of `function_name` in the user's code by
+    timing it on a ladder of input sizes (`complexity_input_sizes`) and
+    fitting the timings against common growth classes.
+
+    With `reference_code`, the reference solution is measured the same way,
+    within the same sandbox execution, and the student's speed is reported
+    relative to it.
+    """
+    input_sizes = settings.complexity_input_sizes
+    time_limit_per_size = settings.complexity_time_limit_per_size
+
+    benchmark_programs = [
+        build_benchmark_program(
+            code = code,
+            function_name = function_name,
+            input_sizes = input_sizes,
+            time_limit_per_size = time_limit_per_size,
+            sample_input = sample_input,
+            input_generator = input_generator
+        )
+        for code in ([user_code] if reference_code is None else [user_code, reference_code])
+    ]
+    benchmark_results = run_benchmark_programs(
+        benchmark_programs = benchmark_programs,
+        per_program_timeout = math.ceil(len(input_sizes) * time_limit_per_size) + 2,
+        backend = backend
+    )
+
+    student_analysis = _summarize_benchmark(benchmark_results[0])
+    if reference_code is None:
+        return {
+            'student': student_analysis,
+            'reference': None,
+            'relative_speed': None,
+        }
+
+    reference_analysis = _summarize_benchmark(benchmark_results[1])
+    return {
+        'student': student_analysis,
+        'reference': reference_analysis,
+        'relative_speed': compute_slowdown(student_analysis['timings'], reference_analysis['timings']),
+    }
+
+
+def estimate_lecture_question_time_complexity(user_code: str, lecture_question: LectureQuestion) -> Optional[dict]:
+    """
+    `estimate_time_complexity` against the question's `correct_solution`.
+    Only function questions can be measured; returns None for the others.
+    """
+    if lecture_question.test_function_name != 'run_test_cases_with_function':
+        return None
+
+    return estimate_time_complexity(
+        user_code = user_code,
+        function_name = lecture_question.function_name,
+        reference_code = lecture_question.correct_solution,
+        sample_input = get_lecture_question_sample_input(lecture_question),
+        input_generator = lecture_question.performance_input_generator,
+        backend = lecture_question.executor_backend
+    )
@@ -0,0 +1,69 @@
+import math
+from typing import Optional
+
+from app.config import settings
+from app.models import LectureQuestion
+from app.performance.benchmark import build_benchmark_program, run_benchmark_programs, get_lecture_question_sample_input
+from app.performance.complexity import compute_slowdown
+
+
+PERFORMANCE_STATUS_WITHIN_THRESHOLD = "within_threshold"
+PERFORMANCE_STATUS_TOO_SLOW = "correct_but_too_slow"
+
+
+def grade_relative_performance(user_code: str, lecture_question: LectureQuestion) -> Optional[dict]:
+    """
+    Time the student's function and the question's `correct_solution` on the
+    same (large) input, within the same sandbox execution, and mark the
+    submission as "correct but too slow" when it is more than the question's
+    `performance_slowdown_threshold` times slower.
+
+    Returns None for questions without a threshold (or that aren't function
+    questions).
+    """
+    if lecture_question.performance_slowdown_threshold is None or lecture_question.test_function_name != 'run_test_cases_with_function':
+        return None
+
+    input_size = lecture_question.performance_input_size or settings.performance_grading_default_input_size
+    time_limit = settings.performance_grading_time_limit
+    benchmark_programs = [
+        build_benchmark_program(
+            code = code,
+            function_name = lecture_question.function_name,
+            input_sizes = [input_size],
+            time_limit_per_size = time_limit,
+            sample_input = get_lecture_question_sample_input(lecture_question),
+            input_generator = lecture_question.performance_input_generator
+        )
+        for code in (user_code, lecture_question.correct_solution)
+    ]
+    student_benchmark, reference_benchmark = run_benchmark_programs(
+        benchmark_programs = benchmark_programs,
+        per_program_timeout = math.ceil(time_limit) + 2,
+        backend = lecture_question.executor_backend
+    )
+
+    slowdown = compute_slowdown(student_benchmark['timings'], reference_benchmark['timings'])
+    performance_result = {
+        'input_size': input_size,
+        'slowdown_threshold': lecture_question.performance_slowdown_threshold,
+        'slowdown_ratio': None,
+        'status': PERFORMANCE_STATUS_WITHIN_THRESHOLD,
+        'reason': None,
+    }
+
+    if len(reference_benchmark['timings']) == 0:
+        # Nothing to compare against; don't hold it against the student
+        performance_result['reason'] = "The reference solution could not be timed."
+    elif len(student_benchmark['timings']) == 0:
+        performance_result['status'] = PERFORMANCE_STATUS_TOO_SLOW
+        performance_result['reason'] = student_benchmark.get('stopped_reason') or student_benchmark.get('error')
+    elif slowdown is not None and slowdown['slowdown_ratio'] is not None:
+        performance_result['slowdown_ratio'] = slowdown['slowdown_ratio']
+        performance_result['student_time_seconds'] = slowdown['student_time_seconds']
+        performance_result['reference_time_seconds'] = slowdown['reference_time_seconds']
+        # Below the noise floor, ratios between timings are meaningless
+        if slowdown['student_time_seconds'] >= settings.performance_grading_min_time_seconds and slowdown['slowdown_ratio'] > lecture_question.performance_slowdown_threshold:
+            performance_result['status'] = PERFORMANCE_STATUS_TOO_SLOW
+
+    return performance_result
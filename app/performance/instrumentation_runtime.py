@@ -0,0 +1,206 @@
+"""
+Instrumented runs of a submission, executed *inside* the sandbox.
+
+This file only depends on the standard library: its source runs through the
+test harness (see `app/performance/profiling.py`), with one of the
+`_companion_*` entry points as the result expression. The student's code is
+passed in as a string and compiled as `<student_code>`, so its frames can be
+told apart from this runtime's.
+"""
+import sys
+import time
+import signal
+import cProfile
+import tracemalloc
+
+STUDENT_CODE_FILENAME = "<student_code>"
+
+
+class _CompanionInstrumentationTimeout(BaseException):
+    pass
+
+
+def _companion_run_test_cases(user_code, test_cases, time_limit, before_each=None, after_each=None):
+    """
+    Run the student's code once per `[code_prefix, result_expression]` test
+    case, stopping after `time_limit` seconds. Returns why it stopped early
+    (or the first error the student's code raised), or None.
+    """
+    def _on_alarm(signum, frame):
+        raise _CompanionInstrumentationTimeout()
+
+    stopped_reason = None
+    previous_handler = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        # Compile everything up front, so compiling isn't part of what's measured
+        compiled_user_code = compile(user_code, STUDENT_CODE_FILENAME, "exec")
+        compiled_test_cases = [
+            (
+                compile(code_prefix, "<test input>", "exec"),
+                compile(result_expression, "<test case>", "eval") if result_expression is not None else None
+            )
+            for code_prefix, result_expression in test_cases
+        ]
+        for compiled_code_prefix, compiled_result_expression in compiled_test_cases:
+            program_globals = {"__name__": "__main__", "__builtins__": __builtins__}
+            exec(compiled_code_prefix, program_globals)
+            if before_each is not None:
+                before_each()
+            try:
+                exec(compiled_user_code, program_globals)
+                if compiled_result_expression is not None:
+                    # Kept alive until `after_each`, which may measure it
+                    result_value = eval(compiled_result_expression, program_globals)
+            except SystemExit:
+                pass
+            except Exception as e:
+                if stopped_reason is None:
+                    stopped_reason = f"{type(e).__name__}: {e}"
+            finally:
+                if after_each is not None:
+                    after_each()
+    except _CompanionInstrumentationTimeout:
+        stopped_reason = f"time limit of {time_limit} seconds reached"
+    except SyntaxError as e:
+        stopped_reason = f"SyntaxError: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+    return stopped_reason
+
+
+def _companion_function_profile(user_code, test_cases, top_n, time_limit):
+    profiler = cProfile.Profile()
+    stopped_reason = _companion_run_test_cases(user_code, test_cases, time_limit, profiler.enable, profiler.disable)
+
+    profiler.create_stats()
+
+    hot_functions = []
+    for (filename, lineno, function_name), (_, number_of_calls, own_time, cumulative_time, callers) in profiler.stats.items():
+        # The student's functions, and the builtins they call
+        called_by_student_code = any(caller[0] == STUDENT_CODE_FILENAME for caller in callers)
+        if filename == STUDENT_CODE_FILENAME or (filename == "~" and called_by_student_code):
+            hot_functions.append({
+                "function": function_name,
+                "line": lineno if filename == STUDENT_CODE_FILENAME else None,
+                "calls": number_of_calls,
+                "own_time_ms": round(own_time * 1000, 3),
+                "cumulative_time_ms": round(cumulative_time * 1000, 3),
+            })
+    hot_functions.sort(key=lambda entry: entry["own_time_ms"], reverse=True)
+    return hot_functions[:top_n], stopped_reason
+
+
+def _companion_line_profile(user_code, test_cases, top_n, time_limit):
+    line_hits = {}
+    line_times = {}
+    last_line = [None, 0.0]
+
+    def _record_time_until_now():
+        now = time.perf_counter()
+        if last_line[0] is not None:
+            line_times[last_line[0]] = line_times.get(last_line[0], 0.0) + now - last_line[1]
+        return now
+
+    def _trace_line(frame, event, arg):
+        if event == "line":
+            now = _record_time_until_now()
+            line_hits[frame.f_lineno] = line_hits.get(frame.f_lineno, 0) + 1
+            last_line[0], last_line[1] = frame.f_lineno, now
+        return _trace_line
+
+    def _trace_call(frame, event, arg):
+        if frame.f_code.co_filename == STUDENT_CODE_FILENAME:
+            return _trace_line
+        return None
+
+    def _stop_tracing():
+        sys.settrace(None)
+        _record_time_until_now()
+        last_line[0] = None
+
+    stopped_reason = _companion_run_test_cases(user_code, test_cases, time_limit, lambda: sys.settrace(_trace_call), _stop_tracing)
+
+    source_lines = user_code.splitlines()
+    hot_lines = [
+        {
+            "line": lineno,
+            "hits": line_hits.get(lineno, 0),
+            "time_ms": round(line_time * 1000, 3),
+            "source": source_lines[lineno - 1].strip() if 0 < lineno <= len(source_lines) else "",
+        }
+        for lineno, line_time in line_times.items()
+    ]
+    hot_lines.sort(key=lambda entry: entry["time_ms"], reverse=True)
+    return hot_lines[:top_n], stopped_reason
+
+
+def _companion_profile(user_code, test_cases, top_n, time_limit):
+    """
+    Profile the student's code over the test cases: once under cProfile for
+    the hottest functions, then under a line tracer for the hottest lines
+    (separately, so the tracer's overhead doesn't distort function timings).
+    """
+    hot_functions, stopped_reason = _companion_function_profile(user_code, test_cases, top_n, time_limit / 2)
+    hot_lines, line_profile_stopped_reason = _companion_line_profile(user_code, test_cases, top_n, time_limit / 2)
+    return {
+        "hot_functions": hot_functions,
+        "hot_lines": hot_lines,
+        "stopped_reason": stopped_reason or line_profile_stopped_reason,
+    }
+
+
+def _companion_trace_memory(user_code, test_cases, top_n, time_limit):
+    """
+    Run the student's code over the test cases with allocation tracing, and
+    report the highest peak of traced memory, and the lines of the student's
+    code holding the most memory at the largest point it was seen at.
+
+    Snapshots are taken as the student's functions return (their locals are
+    still alive then), and only when memory use is higher than at the last
+    snapshot, so the tracing stays cheap.
+    """
+    peak = {"size": 0, "snapshot_size": 0, "snapshot": None}
+
+    def _take_snapshot_if_higher():
+        current_size, _ = tracemalloc.get_traced_memory()
+        if current_size > peak["snapshot_size"]:
+            peak["snapshot_size"] = current_size
+            peak["snapshot"] = tracemalloc.take_snapshot()
+
+    def _on_profile_event(frame, event, arg):
+        if event == "return" and frame.f_code.co_filename == STUDENT_CODE_FILENAME:
+            _take_snapshot_if_higher()
+
+    def _start_tracing():
+        tracemalloc.start()
+        sys.setprofile(_on_profile_event)
+
+    def _stop_tracing():
+        sys.setprofile(None)
+        _take_snapshot_if_higher()
+        peak["size"] = max(peak["size"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    stopped_reason = _companion_run_test_cases(user_code, test_cases, time_limit, _start_tracing, _stop_tracing)
+
+    source_lines = user_code.splitlines()
+    top_allocations = []
+    if peak["snapshot"] is not None:
+        student_code_snapshot = peak["snapshot"].filter_traces([tracemalloc.Filter(True, STUDENT_CODE_FILENAME)])
+        for statistic in student_code_snapshot.statistics("lineno")[:top_n]:
+            lineno = statistic.traceback[0].lineno
+            top_allocations.append({
+                "line": lineno,
+                "size_kb": round(statistic.size / 1024, 1),
+                "count": statistic.count,
+                "source": source_lines[lineno - 1].strip() if 0 < lineno <= len(source_lines) else "",
+            })
+
+    return {
+        "peak_memory_kb": round(peak["size"] / 1024, 1),
+        "top_allocations": top_allocations,
+        "out_of_memory": stopped_reason is not None and stopped_reason.startswith("MemoryError"),
+        "stopped_reason": stopped_reason,
+    }
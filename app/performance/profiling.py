@@ -0,0 +1,123 @@
+import os
+import math
+from typing import Optional
+
+from app.config import settings
+from app.models import LectureQuestion
+from app.grading.compiled_test_cases import get_compiled_test_cases
+from app.performance.benchmark import run_analysis_programs
+
+
+INSTRUMENTATION_RUNTIME_PATH = os.path.join(os.path.dirname(__file__), "instrumentation_runtime.py")
+
+with open(INSTRUMENTATION_RUNTIME_PATH, "r") as f:
+    INSTRUMENTATION_RUNTIME_SOURCE = f.read()
+
+
+def build_instrumented_program(entry_point: str, user_code: str, compiled_test_cases: list, top_n: int, time_limit: float) -> dict:
+    """
+    Build a harness program that runs the user's code over the test cases
+    under one of the instrumentation runtime's entry points.
+    """
+    test_cases = [
+        [compiled_test_case['code_prefix'], compiled_test_case['result_expression']]
+        for compiled_test_case in compiled_test_cases
+    ]
+    return {
+        "code": INSTRUMENTATION_RUNTIME_SOURCE,
+        "result_expression": f"{entry_point}({user_code!r}, {test_cases!r}, {top_n!r}, {time_limit!r})",
+    }
+
+
+def profile_lecture_submission(user_code: str, lecture_question: LectureQuestion) -> Optional[dict]:
+    """
+    Run the submission over the question's test cases under a deterministic
+    profiler, and return its hottest functions and lines:
+    `{"hot_functions": [...], "hot_lines": [...], "stopped_reason": ...}`.
+    """
+    compiled_test_cases = get_compiled_test_cases(lecture_question)
+    if compiled_test_cases is None:
+        return None
+
+    time_limit = settings.profiling_time_limit
+    profile_result, = run_analysis_programs(
+        analysis_programs = [
+            build_instrumented_program(
+                entry_point = "_companion_profile",
+                user_code = user_code,
+                compiled_test_cases = compiled_test_cases,
+                top_n = settings.profiling_top_n,
+                time_limit = time_limit
+            )
+        ],
+        per_program_timeout = math.ceil(time_limit) + 2,
+        backend = lecture_question.executor_backend
+    )
+    return profile_result
+
+
+def format_profile_summary(profile_result: dict) -> str:
+    """
+    Condense a profile into a few lines for the tutor prompt.
+    """
+    if 'error' in profile_result:
+        return f"The profiling run failed: {profile_result['error']}"
+
+    summary_lines = ["Hottest functions (by own time):"]
+    for entry in profile_result['hot_functions']:
+        location = f" (line {entry['line']})" if entry['line'] is not None else ""
+        summary_lines.append(
+            f"- {entry['function']}{location}: {entry['calls']} calls, {entry['own_time_ms']} ms own time, {entry['cumulative_time_ms']} ms cumulative"
+        )
+    summary_lines.append("Hottest lines (by time):")
+    for entry in profile_result['hot_lines']:
+        summary_lines.append(f"- line {entry['line']} ({entry['hits']} hits, {entry['time_ms']} ms): {entry['source']}")
+    if profile_result.get('stopped_reason'):
+        summary_lines.append(f"Profiling stopped early: {profile_result['stopped_reason']}")
+    return "\n".join(summary_lines)
+
+
+def trace_lecture_submission_memory(user_code: str, lecture_question: LectureQuestion) -> Optional[dict]:
+    """
+    Run the submission over the question's test cases with allocation
+    tracing, and return its peak traced memory and top allocating lines:
+    `{"peak_memory_kb": ..., "top_allocations": [...], "out_of_memory": bool,
+    "stopped_reason": ...}`.
+    """
+    compiled_test_cases = get_compiled_test_cases(lecture_question)
+    if compiled_test_cases is None:
+        return None
+
+    time_limit = settings.profiling_time_limit
+    memory_trace_result, = run_analysis_programs(
+        analysis_programs = [
+            build_instrumented_program(
+                entry_point = "_companion_trace_memory",
+                user_code = user_code,
+                compiled_test_cases = compiled_test_cases,
+                top_n = settings.profiling_top_n,
+                time_limit = time_limit
+            )
+        ],
+        per_program_timeout = math.ceil(time_limit) + 2,
+        backend = lecture_question.executor_backend
+    )
+    return memory_trace_result
+
+
+def format_memory_trace_summary(memory_trace_result: dict) -> str:
+    """
+    Condense a memory trace into a few lines for the tutor prompt.
+    """
+    if 'error' in memory_trace_result:
+        if memory_trace_result.get('out_of_memory'):
+            return "The student's code ran out of memory and was killed."
+        return f"The memory tracing run failed: {memory_trace_result['error']}"
+
+    summary_lines = [f"Peak traced memory: {memory_trace_result['peak_memory_kb']} kb"]
+    if memory_trace_result['out_of_memory']:
+        summary_lines.append("The student's code ran out of memory (MemoryError).")
+    summary_lines.append("Lines holding the most memory:")
+    for entry in memory_trace_result['top_allocations']:
+        summary_lines.append(f"- line {entry['line']} ({entry['size_kb']} kb in {entry['count']} blocks): {entry['source']}")
+    return "\n".join(summary_lines)
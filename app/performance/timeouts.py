@@ -0,0 +1,46 @@
+import math
+from typing import Optional
+
+from app.config import settings
+from app.models import LectureQuestion
+from app.code_execution_utils import run_compiled_test_cases
+from app.grading.compiled_test_cases import get_compiled_test_cases
+from app.execution.profiles import get_lecture_question_execution_profile
+
+
+def derive_execution_timeout(lecture_question: LectureQuestion, multiplier: Optional[float] = None) -> Optional[dict]:
+    """
+    Time the question's `correct_solution` over its test cases and derive a
+    per test case timeout from its slowest one: `multiplier` (the
+    `execution_timeout_multiplier` setting by default) times its wall time,
+    rounded up to whole seconds and kept between the
+    `execution_timeout_min_seconds` and `harness_per_case_timeout` settings.
+
+    Returns `{"reference_max_wall_time_ms", "timeout_seconds"}`, or None when
+    the question has no test cases or its solution doesn't pass all of them.
+    """
+    compiled_test_cases = get_compiled_test_cases(lecture_question)
+    if compiled_test_cases is None or len(compiled_test_cases) == 0 or not lecture_question.correct_solution:
+        return None
+
+    # Time the reference under the question's limits, but not under a timeout
+    # derived earlier
+    execution_profile = get_lecture_question_execution_profile(lecture_question)
+    execution_profile['per_case_timeout'] = settings.harness_per_case_timeout
+    tc_results = run_compiled_test_cases(
+        user_code = lecture_question.correct_solution,
+        compiled_test_cases = compiled_test_cases,
+        backend = lecture_question.executor_backend,
+        execution_profile = execution_profile
+    )
+    if any(rslt['correct'] != 'yes' or 'execution_metrics' not in rslt for rslt in tc_results):
+        return None
+
+    if multiplier is None:
+        multiplier = settings.execution_timeout_multiplier
+    reference_max_wall_time_ms = max(rslt['execution_metrics']['wall_time_ms'] for rslt in tc_results)
+    timeout_seconds = math.ceil(reference_max_wall_time_ms / 1000 * multiplier)
+    return {
+        'reference_max_wall_time_ms': reference_max_wall_time_ms,
+        'timeout_seconds': min(max(timeout_seconds, settings.execution_timeout_min_seconds), settings.harness_per_case_timeout),
+    }
@@ -27,9 +27,11 @@ class ValidateAuthZeroUserSchema(BaseModel):
     profile_picture_url: str
     sub_id: str
 
-class CodeExecutionRequestSchema(BaseModel):
+class CodeExecutionRequestSchema(NotRequiredAnonUserSchema):
     language: str
     code: str
+    stream_output: Optional[bool] = False
+    defer_if_busy: Optional[bool] = False
 
 class SaveCodeSchema(UpdateQuestionSchema):
     code: str
@@ -52,6 +54,29 @@ class FetchLectureDetailSchema(BaseModel):
 class LectureQuestionSubmissionSchema(BaseModel):
     lecture_question_id: str
     code: str
+    async_grading: Optional[bool] = False
+    fail_fast: Optional[bool] = False
+    analyze_complexity: Optional[bool] = False
+    profile: Optional[bool] = False
+    trace_memory: Optional[bool] = False
+    idempotency_key: Optional[str] = None
+
+class TimeComplexityAnalysisSchema(BaseModel):
+    code: str
+    function_name: Optional[str] = None
+    sample_input: Optional[dict] = None
+    input_generator: Optional[str] = None
+    lecture_question_id: Optional[str] = None
+    initial_playground_question_id: Optional[str] = None
+
+class PreflightCheckSchema(BaseModel):
+    code: str
+    function_name: Optional[str] = None
+    class_name: Optional[str] = None
+    lecture_question_id: Optional[str] = None
+
+class TaskStatusBatchSchema(BaseModel):
+    task_ids: list[str]
 
 class ProblemSetFetchSchema(BaseModel):
     problem_set_object_id: str
@@ -0,0 +1,24 @@
+import os
+import threading
+
+import redis
+
+from app.config import settings
+
+
+_redis_clients = {}
+_redis_clients_lock = threading.Lock()
+
+
+def get_redis_client(db: int = 0) -> redis.Redis:
+    """
+    Return a process-wide Redis client for the given logical database.
+    """
+    client_key = (os.getpid(), db)
+    with _redis_clients_lock:
+        if client_key not in _redis_clients:
+            _redis_clients[client_key] = redis.Redis.from_url(
+                settings.redis_backend_url,
+                db = db
+            )
+        return _redis_clients[client_key]
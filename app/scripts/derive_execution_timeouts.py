@@ -0,0 +1,45 @@
+"""
+Derive every lecture question's per test case timeout from its reference
+solution (see `derive_execution_timeout`), and print it.
+
+    python app/scripts/derive_execution_timeouts.py [--multiplier 5] [--apply]
+
+With `--apply`, the timeouts are saved on the questions
+(`execution_timeout_seconds`); questions whose solution can't be timed keep
+theirs.
+"""
+import os
+import sys
+import argparse
+parent_dir_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+sys.path.append(parent_dir_path)
+from app import models
+from app.database import SessionLocal
+from app.performance.timeouts import derive_execution_timeout
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--multiplier", type=float, default=None)
+parser.add_argument("--apply", action="store_true")
+args = parser.parse_args()
+
+db = SessionLocal()
+try:
+    lecture_question_objects = db.query(models.LectureQuestion).order_by(models.LectureQuestion.id).all()
+    for lecture_question in lecture_question_objects:
+        derived_timeout = derive_execution_timeout(lecture_question, multiplier=args.multiplier)
+        if derived_timeout is None:
+            print(f"Question {lecture_question.id}: the reference solution could not be timed; skipping.")
+            continue
+
+        print(
+            f"Question {lecture_question.id}: slowest test case took {derived_timeout['reference_max_wall_time_ms']} ms; "
+            f"timeout {lecture_question.execution_timeout_seconds} -> {derived_timeout['timeout_seconds']} seconds"
+        )
+        if args.apply:
+            lecture_question.execution_timeout_seconds = derived_timeout['timeout_seconds']
+
+    if args.apply:
+        db.commit()
+finally:
+    db.close()
@@ -1,90 +1,6 @@
-import os
-import docker
 import pprint
 import json
-
-
-def execute_code_in_container(language: str, code: str):
-    """
-    Task to run user-submitted code inside a Docker container.
-    """
-    # Set up language-specific Docker image
-    docker_image = {
-        "python": "python:3.12-slim",
-    }.get(language)
-
-    if not docker_image:
-        raise ValueError("Unsupported language")
-
-    language_file_extension = {
-        "python": ".py",
-    }
-    current_file_extension = language_file_extension.get(language)
-    if not current_file_extension:
-        raise ValueError("Unsupported language")
-
-    # Write the user's code to a temporary file
-    host_code_dir = "/tmp"  # Directory on the host
-    # code_file_name = "submission_code.py"  # Name of the file
-    code_file_name = f"submission_code{current_file_extension}"
-    host_code_file = os.path.join(host_code_dir, code_file_name)
-
-    with open(host_code_file, "w") as f:
-        f.write(code)
-
-    # The code will be placed in the /app directory inside the container
-    container_code_file = f"/app/{code_file_name}"
-
-    MAX_EXECUTION_TIME_IN_SECONDS = 10
-
-    # Initialize Docker client
-    client = docker.from_env()
-
-    # Command to run inside the container
-    exec_cmd = {
-        "python": f"python {container_code_file}",
-    }.get(language)
-
-    result = None
-    try:
-        container = client.containers.run(
-            image = docker_image,
-            command = exec_cmd,
-            volumes = {host_code_dir: {"bind": "/app", "mode": "rw"}}, # Mount directory
-            working_dir = "/app",
-            detach = True,
-            user = "nobody",
-            read_only = True,
-            network_mode = "none",
-            mem_limit = "256m",
-            cpu_period = 100000,
-            cpu_quota = 50000,
-            pids_limit = 64,
-            security_opt = ["no-new-privileges"]
-        )
-        result = container.wait(
-            timeout = MAX_EXECUTION_TIME_IN_SECONDS
-        )
-        logs = container.logs().decode("utf-8")
-    except docker.errors.ContainerError as e:
-        logs = f"Error: {str(e)}"
-    except docker.errors.APIError as e:
-        logs = f"Docker API Error: {str(e)}"
-    except docker.errors.DockerException as e:
-        logs = f"Docker Execution Error: {str(e)}"
-    except Exception as e:
-        logs = f"Unexpected Error: {str(e)}"
-    finally:
-        # Clean up the container
-        container.remove(force=True)
-
-    if result is not None:
-        if result["StatusCode"] == 0:
-            return {"success": True, "output": logs}
-        else:
-            return {"success": False, "output": logs}
-    else:
-        return {"success": False, "output": logs}
+from app.code_execution_utils import execute_code_in_container
 
 
 def run_test_cases_without_function(language: str, code: str, test_cases: list):
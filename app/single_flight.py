@@ -0,0 +1,79 @@
+import json
+import uuid
+import hashlib
+from typing import Optional
+
+import redis
+
+from app.config import settings
+from app.redis_client import get_redis_client
+
+
+SINGLE_FLIGHT_KEY_PREFIX = "single_flight:"
+
+# Only the flight that set a key may remove it
+_LEAVE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def compute_single_flight_key(*key_parts) -> str:
+    """
+    Content-address a request, e.g. from the user, the question and the
+    code: identical requests get the same key.
+    """
+    return hashlib.sha256(json.dumps(key_parts, default=str).encode("utf-8")).hexdigest()
+
+
+class SingleFlight(object):
+    """
+    Attaches duplicate requests (double clicks, double renders, retries) to
+    the execution already running for the same key, instead of starting
+    another one.
+
+    The first request to `join` a key leads the flight: it gets a new flight
+    id (used as the Celery task id, or to publish its completion under) and
+    runs it, then `leave`s the key. Requests joining in the meantime get the
+    leader's flight id, and wait for or return the same result.
+
+    Keys expire after `ttl_seconds`, so a leader that died doesn't hold them
+    forever. When Redis is unavailable, every request leads its own flight.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl_seconds: int):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    def join(self, flight_key: str, ttl_seconds: Optional[int] = None) -> tuple:
+        """
+        Returns `(flight_id, is_leader)`. `ttl_seconds` overrides how long the
+        key is kept (e.g. for idempotency keys, which outlive the flight).
+        """
+        flight_id = str(uuid.uuid4())
+        try:
+            for _ in range(2):
+                if self.redis_client.set(SINGLE_FLIGHT_KEY_PREFIX + flight_key, flight_id, nx=True, ex=ttl_seconds or self.ttl_seconds):
+                    return flight_id, True
+                leader_flight_id = self.redis_client.get(SINGLE_FLIGHT_KEY_PREFIX + flight_key)
+                if leader_flight_id is not None:
+                    return leader_flight_id.decode("utf-8"), False
+                # The leader left in between; try to lead again
+        except redis.RedisError:
+            pass
+        return flight_id, True
+
+    def leave(self, flight_key: str, flight_id: str):
+        try:
+            self.redis_client.eval(_LEAVE_SCRIPT, 1, SINGLE_FLIGHT_KEY_PREFIX + flight_key, flight_id)
+        except redis.RedisError:
+            pass
+
+
+def get_single_flight() -> SingleFlight:
+    return SingleFlight(
+        redis_client = get_redis_client(),
+        ttl_seconds = settings.single_flight_ttl_seconds
+    )
@@ -0,0 +1,59 @@
+import json
+import asyncio
+from typing import Optional
+
+from app.redis_client import get_redis_client
+from app.event_stream import EVENT_LOG_PREFIX, EVENT_LOG_TTL_SECONDS, RedisEventPublisher, subscribe_to_events
+
+
+COMPLETION_STREAM_PREFIX = "task_completion:"
+COMPLETION_EVENT_TYPES = ('complete', 'error')
+
+
+class TaskCompletionPublisher(RedisEventPublisher):
+    """
+    Publishes a single event once a Celery task is done: `complete` with its
+    result, or `error`. Waiters are woken up by it (see
+    `wait_for_task_completion`) instead of blocking on the result backend.
+    """
+
+    def __init__(self, task_id: str, log_ttl_seconds: int = EVENT_LOG_TTL_SECONDS):
+        super().__init__(COMPLETION_STREAM_PREFIX + task_id, log_ttl_seconds=log_ttl_seconds)
+
+    def publish_complete(self, result):
+        self.publish({'type': 'complete', 'result': result})
+
+    def publish_error(self, error_message: str):
+        self.publish({'type': 'error', 'error': error_message})
+
+
+async def wait_for_task_completion(task_id: str, timeout: float) -> Optional[dict]:
+    """
+    The task's completion event, as soon as it is published (or right away
+    if it already was), or None after `timeout` seconds. Waiting doesn't
+    hold a thread.
+    """
+    completion_events = subscribe_to_events(
+        stream_name = COMPLETION_STREAM_PREFIX + task_id,
+        final_event_types = COMPLETION_EVENT_TYPES
+    )
+    try:
+        return await asyncio.wait_for(completion_events.__anext__(), timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        await completion_events.aclose()
+
+
+def get_task_completions(task_ids: list) -> dict:
+    """
+    The completion event of every task that has one (the others map to
+    None), in a single round trip.
+    """
+    pipeline = get_redis_client().pipeline()
+    for task_id in task_ids:
+        pipeline.lindex(EVENT_LOG_PREFIX + COMPLETION_STREAM_PREFIX + task_id, -1)
+    return {
+        task_id: json.loads(serialized_event) if serialized_event is not None else None
+        for task_id, serialized_event in zip(task_ids, pipeline.execute())
+    }